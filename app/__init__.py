@@ -1,7 +1,11 @@
-from flask import Flask, render_template, send_from_directory
+from flask import Flask, render_template, send_from_directory, request, g, has_request_context, current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from flask_caching import Cache
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.json_provider import OrjsonProvider
 from config import config
 from decimal import Decimal
 import os
@@ -10,15 +14,22 @@ import os
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
+cache = Cache()
 
 def create_app(config_name='development'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.json = OrjsonProvider(app)
+    
+    if app.config['PROXY_FIX_X_FOR']:
+        # Trust the forwarded client address so per-IP limits see real clients
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
     
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    cache.init_app(app)
     
     # Login manager settings
     login_manager.login_view = 'auth.login'
@@ -30,7 +41,7 @@ def create_app(config_name='development'):
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return db.session.get(User, int(user_id))
     
     '''@app.template_filter('currency')
     def format_currency(value):
@@ -134,6 +145,13 @@ def create_app(config_name='development'):
     
     # Create tables and default user
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            _use_sqlite_wal()
+        if app.debug:
+            _watch_pool_checkouts(app)
+        if app.debug or app.testing:
+            _watch_lazy_loads(app)
+        
         db.create_all()
         
         # Create default admin user
@@ -145,4 +163,71 @@ def create_app(config_name='development'):
             db.session.commit()
             print("Default admin user created: admin/admin123")
     
-    return app
\ No newline at end of file
+    return app
+
+def _use_sqlite_wal():
+    """Put SQLite connections in WAL mode so report reads don't block on checkout writes
+
+    With the default rollback journal a writer locks out every reader for the
+    whole transaction; in WAL mode readers keep seeing the last committed
+    state. synchronous=NORMAL is safe under WAL and skips an fsync per commit.
+    """
+    @event.listens_for(db.engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+def _watch_pool_checkouts(app):
+    """Log requests that check out more than one pooled connection (debug only)
+
+    A commit hands the connection back to the pool, so views that commit and
+    then keep querying show up here as well.
+    """
+    @event.listens_for(db.engine, 'checkout')
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        if has_request_context():
+            g.db_checkouts = g.get('db_checkouts', 0) + 1
+    
+    @app.after_request
+    def report_checkouts(response):
+        checkouts = g.get('db_checkouts', 0)
+        if checkouts > 1:
+            app.logger.debug('%s checked out %d database connections', request.path, checkouts)
+        return response
+
+def _count_lazy_load(orm_execute_state):
+    """Count lazy loads per relationship for the current request"""
+    # Only SELECTs carry load options; writes have no lazy_loaded_from
+    if not has_request_context() or not orm_execute_state.is_select:
+        return
+    if orm_execute_state.lazy_loaded_from is None:
+        return
+    if not (current_app.debug or current_app.testing):
+        return
+    path = orm_execute_state.loader_strategy_path
+    relationship = str(path[-1]) if path else 'unknown'
+    loads = g.setdefault('lazy_loads', {})
+    loads[relationship] = loads.get(relationship, 0) + 1
+    if current_app.testing and loads[relationship] > 1:
+        raise AssertionError(f'{request.path} lazy-loads {relationship} repeatedly (N+1)')
+
+def _watch_lazy_loads(app):
+    """Flag relationships lazy-loaded more than once in a request (debug/testing only)
+
+    Repeated lazy loads of the same relationship are the N+1 pattern; the
+    fix is a selectinload/joinedload on the view's query. Under TESTING the
+    second load raises so a regression fails loudly. The session listener is
+    shared by every app in the process, so it is only registered once and
+    checks the running app's flags itself.
+    """
+    if not event.contains(db.session, 'do_orm_execute', _count_lazy_load):
+        event.listen(db.session, 'do_orm_execute', _count_lazy_load)
+    
+    @app.after_request
+    def report_lazy_loads(response):
+        for relationship, count in g.get('lazy_loads', {}).items():
+            if count > 1:
+                app.logger.warning('%s lazy-loaded %s %d times', request.path, relationship, count)
+        return response
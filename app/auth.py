@@ -6,9 +6,35 @@ from app.decorators import admin_required, manager_required
 from app import db
 from app.models import User, Sale  # Add Sale import
 from app.forms import LoginForm, RegisterForm, EditUserForm  # Add EditUserForm import
+from collections import OrderedDict
+import time
 
 bp = Blueprint('auth', __name__)
 
+# Login throttling: each (IP, username) pair gets a bucket of attempts that
+# refills over time, so brute forcing is rejected before hashing anything.
+# Behind a reverse proxy remote_addr is the proxy's address unless
+# PROXY_FIX_X_FOR is set; without it buckets are effectively per username.
+# Buckets are kept in least-recently-used order under a hard cap, so the
+# table stays bounded however many keys are cycled through.
+LOGIN_ATTEMPTS_BURST = 5
+LOGIN_ATTEMPTS_REFILL_SECONDS = 12
+LOGIN_BUCKETS_MAX = 10000
+_login_buckets = OrderedDict()
+
+def _login_attempt_allowed(key):
+    """Take one token from the login bucket for key; False when empty"""
+    now = time.monotonic()
+    tokens, updated = _login_buckets.pop(key, (LOGIN_ATTEMPTS_BURST, now))
+    tokens = min(LOGIN_ATTEMPTS_BURST, tokens + (now - updated) / LOGIN_ATTEMPTS_REFILL_SECONDS)
+    allowed = tokens >= 1
+    
+    # Re-inserting moves the key to the most recently used end
+    _login_buckets[key] = (tokens - 1 if allowed else tokens, now)
+    if len(_login_buckets) > LOGIN_BUCKETS_MAX:
+        _login_buckets.popitem(last=False)
+    return allowed
+
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -19,12 +45,22 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
+        if not _login_attempt_allowed(f'{request.remote_addr}|{form.username.data}'):
+            flash('Too many login attempts. Please wait a minute and try again.', 'danger')
+            return render_template('auth/login.html', form=form), 429
+        
         user = User.query.filter_by(username=form.username.data).first()
+        
+        # Unknown and deactivated accounts pay the same hashing cost as a
+        # wrong password, without touching a real hash
+        if not user or not user.is_active:
+            User.check_dummy_password(form.password.data)
+            user = None
 
         if user and user.check_password(form.password.data):
-            if not user.is_active:
-                flash('Your account has been deactivated. Please contact an administrator.', 'error')
-                return render_template('auth/login.html', form=form)
+            # Move hashes created with an older KDF onto the current one
+            if user.upgrade_password_hash(form.password.data):
+                db.session.commit()
             
             login_user(user, remember=True)
             # Check if user needs to change password
@@ -222,7 +258,7 @@ def manage_users():
 @admin_required
 def edit_user(user_id):
     """Edit user details"""
-    user = User.query.get_or_404(user_id)
+    user = db.get_or_404(User, user_id)
     
     # Prevent editing the current admin user's role to avoid lockout
     if user.id == current_user.id and user.role == 'admin':
@@ -271,7 +307,7 @@ def edit_user(user_id):
 @admin_required
 def confirm_delete_user(user_id):
     """Show confirmation page before deleting user"""
-    user = User.query.get_or_404(user_id)
+    user = db.get_or_404(User, user_id)
     
     # Prevent deleting the current admin user
     if user.id == current_user.id:
@@ -288,7 +324,7 @@ def confirm_delete_user(user_id):
 @admin_required
 def delete_user(user_id):
     """Delete a user"""
-    user = User.query.get_or_404(user_id)
+    user = db.get_or_404(User, user_id)
     
     # Prevent deleting the current admin user
     if user.id == current_user.id:
@@ -330,7 +366,7 @@ def delete_user(user_id):
 @admin_required
 def toggle_user_status(user_id):
     """Toggle user active/inactive status (if you have this field)"""
-    user = User.query.get_or_404(user_id)
+    user = db.get_or_404(User, user_id)
     
     # Prevent deactivating the current admin user
     if user.id == current_user.id:
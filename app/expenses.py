@@ -4,6 +4,7 @@ from app.models import Expense
 from app.forms import ExpenseForm, ExpenseEditForm
 from app.decorators import manager_required
 from app import db
+from app.pos import invalidate_sales_reports
 from datetime import datetime, timedelta
 from sqlalchemy import func, desc
 from werkzeug.utils import secure_filename
@@ -100,11 +101,9 @@ def list_expenses():
         page=page, per_page=20, error_out=False
     )
     
-    # Calculate summary statistics
-    total_expenses = query.count()
-    total_amount = db.session.query(func.sum(Expense.amount)).filter(
-        query.whereclause if query.whereclause is not None else True
-    ).scalar() or 0
+    # Calculate summary statistics; paginate() has already counted the rows
+    total_expenses = expenses.total
+    total_amount = query.with_entities(func.coalesce(func.sum(Expense.amount), 0)).scalar()
     
     # Get expense categories for filter dropdown
     categories = Expense.CATEGORIES
@@ -170,6 +169,7 @@ def add_expense():
                 return render_template('expenses/edit.html', form=form, title='Add Expense')
         
         db.session.commit()
+        invalidate_sales_reports()
         
         flash(f'Expense "{expense.description}" of GHS {expense.amount:.2f} added successfully with supporting document!', 'success')
         return redirect(url_for('expenses.list_expenses'))
@@ -181,7 +181,7 @@ def add_expense():
 @manager_required
 def edit_expense(expense_id):
     """Edit an existing expense"""
-    expense = Expense.query.get_or_404(expense_id)
+    expense = db.get_or_404(Expense, expense_id)
     form = ExpenseEditForm(obj=expense)
     
     if form.validate_on_submit():
@@ -220,6 +220,7 @@ def edit_expense(expense_id):
                 return render_template('expenses/edit.html', form=form, title='Edit Expense', expense=expense)
         
         db.session.commit()
+        invalidate_sales_reports()
         flash(f'Expense "{expense.description}" updated successfully!', 'success')
         return redirect(url_for('expenses.list_expenses'))
     
@@ -230,7 +231,7 @@ def edit_expense(expense_id):
 @manager_required
 def delete_expense(expense_id):
     """Delete an expense and its document"""
-    expense = Expense.query.get_or_404(expense_id)
+    expense = db.get_or_404(Expense, expense_id)
     
     description = expense.description
     amount = expense.amount
@@ -240,6 +241,7 @@ def delete_expense(expense_id):
     
     db.session.delete(expense)
     db.session.commit()
+    invalidate_sales_reports()
     
     flash(f'Expense "{description}" (GHS {amount:.2f}) and its supporting document deleted successfully!', 'info')
     return redirect(url_for('expenses.list_expenses'))
@@ -249,14 +251,14 @@ def delete_expense(expense_id):
 @manager_required
 def confirm_delete_expense(expense_id):
     """Show confirmation page before deleting expense"""
-    expense = Expense.query.get_or_404(expense_id)
+    expense = db.get_or_404(Expense, expense_id)
     return render_template('expenses/confirm_delete.html', expense=expense)
 
 @bp.route('/<int:expense_id>/download-document')
 @login_required
 def download_expense_document(expense_id):
     """Download the expense supporting document"""
-    expense = Expense.query.get_or_404(expense_id)
+    expense = db.get_or_404(Expense, expense_id)
     
     # Check permissions - only managers or the user who created it
     if not current_user.is_manager() and expense.user_id != current_user.id:
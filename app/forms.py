@@ -2,7 +2,7 @@ from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import StringField, PasswordField, SelectField, TextAreaField, DecimalField, IntegerField, SubmitField, BooleanField, DateField, HiddenField
 from wtforms.validators import DataRequired, Length, NumberRange, ValidationError, Optional, EqualTo, Email
-from app.models import User, Product
+from app.models import User, Product, Expense
 from datetime import datetime
 
 class LoginForm(FlaskForm):
@@ -270,18 +270,7 @@ class EditUserForm(FlaskForm):
     submit = SubmitField('Update User')
 
 class ExpenseForm(FlaskForm):
-    category = SelectField('Category', validators=[DataRequired()], choices=[
-        ('rent', 'Rent'),
-        ('utilities', 'Utilities'),
-        ('supplies', 'Office Supplies'),
-        ('inventory', 'Inventory Purchase'),
-        ('maintenance', 'Maintenance & Repairs'),
-        ('marketing', 'Marketing & Advertising'),
-        ('transportation', 'Transportation'),
-        ('insurance', 'Insurance'),
-        ('professional', 'Professional Services'),
-        ('other', 'Other')
-    ])
+    category = SelectField('Category', validators=[DataRequired()], choices=Expense.CATEGORIES)
     
     description = StringField('Description', validators=[
         DataRequired(), 
@@ -313,18 +302,7 @@ class ExpenseForm(FlaskForm):
 
 class ExpenseEditForm(FlaskForm):
     """Form for editing expenses - document upload is optional"""
-    category = SelectField('Category', validators=[DataRequired()], choices=[
-        ('rent', 'Rent'),
-        ('utilities', 'Utilities'),
-        ('supplies', 'Office Supplies'),
-        ('inventory', 'Inventory Purchase'),
-        ('maintenance', 'Maintenance & Repairs'),
-        ('marketing', 'Marketing & Advertising'),
-        ('transportation', 'Transportation'),
-        ('insurance', 'Insurance'),
-        ('professional', 'Professional Services'),
-        ('other', 'Other')
-    ])
+    category = SelectField('Category', validators=[DataRequired()], choices=Expense.CATEGORIES)
     
     description = StringField('Description', validators=[
         DataRequired(), 
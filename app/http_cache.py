@@ -0,0 +1,19 @@
+from flask import request, make_response
+
+
+def not_modified(etag):
+    """304 response if the client already holds this version, else None"""
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def validated(response, etag):
+    """Attach the ETag and a short private cache lifetime to a response"""
+    response = make_response(response)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = 30
+    return response
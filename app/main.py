@@ -14,7 +14,7 @@ def index():
     
     # Basic stats - available to all users
     total_products = Product.query.count()
-    low_stock_products = Product.query.filter(Product.quantity <= 5).count()
+    low_stock_products = Product.query.filter(Product.is_low_stock).count()
     
     # Today's sales count (only completed sales)
     today = date.today()
@@ -43,7 +43,7 @@ def index():
     
     # Low stock products list (first 10) - available to all users
     low_stock_list = Product.query.filter(
-        Product.quantity <= 5
+        Product.is_low_stock
     ).order_by(Product.quantity.asc()).limit(10).all()
     
     # User count (admin only)
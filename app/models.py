@@ -1,20 +1,69 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app
 from flask_login import UserMixin
 from app import db
 from decimal import Decimal
-from sqlalchemy import func
+from sqlalchemy import func, case, cast, inspect, literal, event, DDL
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import selectinload
 import secrets
 import string
 import os
 
+# scrypt work factor (N=2**15, r=8, p=1). Lower N to trade hashing cost
+# for login latency on small hosts; PASSWORD_HASH_METHOD in the app config
+# overrides this default.
+PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+
+# Letters and digits minus the easily confused 0/O and 1/l/I
+_TEMP_PASSWORD_ALPHABET = ''.join(c for c in string.ascii_letters + string.digits if c not in '0Ol1I')
+_secure_random = secrets.SystemRandom()
+
+# Capabilities granted by each role, exposed as User.perms
+_CASHIER_PERMS = frozenset(('cashier', 'sales'))
+_MANAGER_PERMS = _CASHIER_PERMS | {'manager', 'products', 'reports', 'expenses'}
+_ROLE_PERMS = {
+    'admin': _MANAGER_PERMS | {'admin'},
+    'manager': _MANAGER_PERMS,
+    'cashier': _CASHIER_PERMS,
+}
+
+# Placeholder shown for products without an uploaded image
+_DEFAULT_IMAGE_URL = '/static/images/no-product-image.png'
+
+# Share of a pack's purchase price carried by each fractional unit type
+_PACK_COST_SHARES = {'full': Decimal('1'), 'half': Decimal('0.5'), 'quarter': Decimal('0.25')}
+
+def _as_decimal(value):
+    """Decimal for a price value, skipping the str() round trip when it already is one"""
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+def _category_check(name, categories):
+    """CHECK constraint limiting a table's category column to the given choices"""
+    allowed = ', '.join(f"'{value}'" for value, _ in categories)
+    return db.CheckConstraint(f'category IN ({allowed})', name=name)
+
+def _password_hash_method():
+    """KDF method string used for newly stored password hashes"""
+    return current_app.config.get('PASSWORD_HASH_METHOD', PASSWORD_HASH_METHOD)
+
+def _dialect_insert(table):
+    """INSERT construct supporting ON CONFLICT for the active database"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(500))
     role = db.Column(db.String(20), nullable=False, default='cashier')  # admin, manager, cashier
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=func.now())
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     
     # New fields for temporary password functionality
@@ -27,10 +76,13 @@ class User(UserMixin, db.Model):
     # Relationships
     sales = db.relationship('Sale', backref='clerk', lazy=True)
     expenses = db.relationship('Expense', backref='user', lazy=True)
+    
+    # Built on first use by check_dummy_password
+    _dummy_password_hash = None
 
     def set_password(self, password, is_temporary=False):
         """Set password with option to mark as temporary"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=_password_hash_method())
         self.is_temporary_password = is_temporary
         self.must_change_password = is_temporary
         self.last_password_change = datetime.utcnow()
@@ -39,14 +91,44 @@ class User(UserMixin, db.Model):
         self.password_reset_expires = None
     
     def check_password(self, password):
+        if not self.password_hash:
+            return False
         return check_password_hash(self.password_hash, password)
     
+    @classmethod
+    def check_dummy_password(cls, password):
+        """
+        Run one KDF verification against a throwaway hash so that unknown or
+        inactive usernames take as long to reject as a wrong password
+        
+        Returns:
+            bool: Always False
+        """
+        if cls._dummy_password_hash is None:
+            cls._dummy_password_hash = generate_password_hash(
+                secrets.token_urlsafe(16), method=_password_hash_method()
+            )
+        check_password_hash(cls._dummy_password_hash, password)
+        return False
+    
+    def upgrade_password_hash(self, password):
+        """
+        Re-hash an already verified password if it was stored with an
+        older KDF or work factor (e.g. legacy pbkdf2 hashes)
+        
+        Returns:
+            bool: True if the stored hash was replaced
+        """
+        method = _password_hash_method()
+        if not self.password_hash or self.password_hash.startswith(f'{method}$'):
+            return False
+        self.password_hash = generate_password_hash(password, method=method)
+        return True
+    
     @staticmethod
     def generate_temporary_password(length=8):
         """Generate a secure temporary password"""
-        characters = string.ascii_letters + string.digits
-        characters = characters.replace('0', '').replace('O', '').replace('l', '').replace('1', '').replace('I', '')
-        return ''.join(secrets.choice(characters) for _ in range(length))
+        return ''.join(_secure_random.choices(_TEMP_PASSWORD_ALPHABET, k=length))
     
     def generate_password_reset_token(self, expires_in=3600):
         """Generate a password reset token that expires"""
@@ -89,30 +171,35 @@ class User(UserMixin, db.Model):
         self.password_reset_token = None
         self.password_reset_expires = None
         
+    @property
+    def perms(self):
+        """Capabilities of this user's role, e.g. 'reports' in user.perms"""
+        return _ROLE_PERMS.get(self.role, frozenset())
+    
     def is_admin(self):
-        return self.role == 'admin'
+        return 'admin' in self.perms
     
     def is_manager(self):
-        return self.role in ['admin', 'manager']
+        return 'manager' in self.perms
     
     def is_cashier(self):
-        return self.role in ['admin', 'manager', 'cashier']
+        return 'cashier' in self.perms
     
     def can_manage_products(self):
         """Check if user can manage products"""
-        return self.role in ['admin', 'manager']
+        return 'products' in self.perms
     
     def can_make_sales(self):
         """Check if user can make sales"""
-        return self.role in ['cashier', 'manager', 'admin']
+        return 'sales' in self.perms
     
     def can_view_reports(self):
         """Check if user can view reports"""
-        return self.role in ['manager', 'admin']
+        return 'reports' in self.perms
     
     def can_manage_expenses(self):
         """Check if user can manage expenses"""
-        return self.role in ['manager', 'admin']
+        return 'expenses' in self.perms
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -136,9 +223,11 @@ class Product(db.Model):
     # Product image fields
     image_filename = db.Column(db.String(255), nullable=True)
     image_path = db.Column(db.String(500), nullable=True)
+    image_src = db.Column('image_url', db.String(600), nullable=True)  # Public URL, set with the file
     
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=func.now())
     
     # Relationship to sales
     sale_items = db.relationship('SaleItem', backref='product', lazy=True)
@@ -162,7 +251,19 @@ class Product(db.Model):
         ('tools', 'Tools & Hardware'),
         ('other', 'Other')
     ]
+    CATEGORIES_MAP = dict(CATEGORIES)
 
+    __table_args__ = (
+        _category_check('ck_product_category', CATEGORIES),
+        # Lets PostgreSQL serve the prefix LIKE in generate_sku from an index
+        db.Index('ix_product_sku_pattern', 'sku',
+                 postgresql_ops={'sku': 'varchar_pattern_ops'}).ddl_if(dialect='postgresql'),
+        # Trigram indexes serve the '%term%' ILIKE product searches on PostgreSQL
+        *(db.Index(f'ix_product_{column}_trgm', column, postgresql_using='gin',
+                   postgresql_ops={column: 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+          for column in ('name', 'sku', 'description')),
+    )
+    
     # Image configuration
     ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
@@ -170,14 +271,18 @@ class Product(db.Model):
     @property
     def has_image(self):
         """Check if product has an image"""
-        return self.image_filename is not None and self.image_path is not None
+        return self.image_src is not None
     
     @property
     def image_url(self):
         """Get URL for product image"""
-        if self.has_image:
-            return f'/static/uploads/product_images/{self.image_filename}'
-        return '/static/images/no-product-image.png'  # Default placeholder
+        return self.image_src or _DEFAULT_IMAGE_URL
+    
+    def set_image(self, filename, path):
+        """Record an uploaded image file and the URL it is served from"""
+        self.image_filename = filename
+        self.image_path = path
+        self.image_src = f'/static/uploads/product_images/{filename}'
     
     @property
     def total_units_available(self):
@@ -194,46 +299,22 @@ class Product(db.Model):
     def generate_sku(category):
         """Generate a unique SKU based on category prefix + sequential number"""
         category_prefix = category.upper()[:3]
-        
-        existing_skus = db.session.query(Product.sku).filter(
-            Product.sku.like(f'{category_prefix}%')
-        ).all()
-        
-        if not existing_skus:
-            next_number = 1
-        else:
-            numbers = []
-            for (sku,) in existing_skus:
-                try:
-                    number_part = sku[3:]
-                    if number_part.isdigit():
-                        numbers.append(int(number_part))
-                except (ValueError, IndexError):
-                    continue
-            
-            next_number = max(numbers, default=0) + 1
-        
-        return f"{category_prefix}{next_number:04d}"
+        return f"{category_prefix}{SkuSequence.next_value(category_prefix):04d}"
     
     @classmethod
     def create_with_auto_sku(cls, name, category, description=None, purchase_price=0, 
                            full_price=0, half_price=None, quantity=0):
-        """Create a new product with auto-generated SKU"""
-        sku = cls.generate_sku(category)
-        
-        counter = 1
-        original_sku = sku
-        while cls.query.filter_by(sku=sku).first():
-            base = original_sku[:3]
-            base_number = int(original_sku[3:])
-            sku = f"{base}{(base_number + counter):04d}"
-            counter += 1
+        """Create a new product with auto-generated SKU
         
+        The product is added to the session and flushed so its SKU is claimed
+        straight away. SKU numbers come from SkuSequence, so concurrent inserts
+        never draw the same one; the single retry only covers a number that
+        was already taken by a hand-entered SKU.
+        """
         if half_price is None and full_price:
             half_price = Decimal(str(full_price)) / Decimal('2')
         
         product = cls(
-            sku=sku,
             name=name,
             category=category,
             description=description or '',
@@ -244,8 +325,70 @@ class Product(db.Model):
             quantity=quantity
         )
         
+        for attempt in range(2):
+            product.sku = cls.generate_sku(category)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(product)
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+        
         return product
     
+    @classmethod
+    def bulk_create_with_auto_sku(cls, rows):
+        """
+        Insert many products at once with auto-generated SKUs
+        
+        Each category prefix reserves its block of SKU numbers with one
+        sequence update, then all rows go to the database in one bulk insert.
+        
+        Args:
+            rows: list of dicts with name, category and optionally description,
+                  purchase_price, full_price, half_price, quantity
+        
+        Returns:
+            list: Generated SKUs, in the same order as rows
+        """
+        counts = {}
+        for row in rows:
+            prefix = row['category'].upper()[:3]
+            counts[prefix] = counts.get(prefix, 0) + 1
+        next_numbers = {prefix: SkuSequence.next_value(prefix, count) - count + 1
+                        for prefix, count in counts.items()}
+        mappings = []
+        skus = []
+        
+        for row in rows:
+            category = row['category']
+            prefix = category.upper()[:3]
+            sku = f"{prefix}{next_numbers[prefix]:04d}"
+            next_numbers[prefix] += 1
+            
+            full_price = _as_decimal(row.get('full_price', 0))
+            half_price = row.get('half_price')
+            if half_price is None and full_price:
+                half_price = full_price / Decimal('2')
+            
+            mappings.append({
+                'sku': sku,
+                'name': row['name'],
+                'category': category,
+                'description': row.get('description') or '',
+                'purchase_price': _as_decimal(row.get('purchase_price', 0)),
+                'full_price': full_price,
+                'half_price': _as_decimal(half_price) if half_price else None,
+                'price': full_price,
+                'quantity': row.get('quantity', 0)
+            })
+            skus.append(sku)
+        
+        if mappings:
+            db.session.bulk_insert_mappings(cls, mappings)
+        return skus
+    
     def get_price_for_unit(self, unit_type='full'):
         """Get price based on unit type"""
         if unit_type == 'unit':
@@ -258,29 +401,23 @@ class Product(db.Model):
         else:  # full
             return self.full_price
     
+    def get_cost_for_unit(self, unit_type='full'):
+        """Get purchase cost for a unit type"""
+        if unit_type == 'unit':
+            return self.cost_per_unit
+        # Pack fractions are exact Decimal multiples, no division needed
+        return self.purchase_price * _PACK_COST_SHARES.get(unit_type, _PACK_COST_SHARES['full'])
+    
     def get_profit_for_unit(self, unit_type='full'):
         """Calculate profit for a unit type"""
-        selling_price = self.get_price_for_unit(unit_type)
-        
-        if unit_type == 'unit':
-            # Cost per unit = purchase price / units per pack
-            cost = self.purchase_price / Decimal(str(self.units_per_pack))
-        elif unit_type == 'half':
-            cost = self.purchase_price / Decimal('2')
-        elif unit_type == 'quarter':
-            cost = self.purchase_price / Decimal('4')
-        else:  # full
-            cost = self.purchase_price
-        
-        return selling_price - cost
+        return self.get_price_for_unit(unit_type) - self.get_cost_for_unit(unit_type)
     
     @property
     def category_display(self):
         """Get human-readable category name"""
-        category_dict = dict(self.CATEGORIES)
-        return category_dict.get(self.category, self.category.title())
+        return self.CATEGORIES_MAP.get(self.category, self.category.title())
     
-    @property
+    @hybrid_property
     def profit_margin(self):
         """Calculate profit margin percentage"""
         if self.full_price > 0:
@@ -288,6 +425,43 @@ class Product(db.Model):
             return (profit / self.full_price) * 100
         return 0
     
+    @profit_margin.expression
+    def profit_margin(cls):
+        return case(
+            (cls.full_price > 0, (cls.full_price - cls.purchase_price) * 100 / cls.full_price),
+            else_=0
+        )
+    
+    @classmethod
+    def cart_pricing(cls, product_ids):
+        """
+        Stock, prices and profits for several products in one query
+        
+        Prices and profits per unit type are computed by the database from
+        the same expressions as the hybrid properties.
+        
+        Returns:
+            dict: {product_id: row} where each row has name, sku, quantity,
+            units_per_pack and price_<unit_type> / profit_<unit_type> columns
+            for full, half, quarter and unit
+        """
+        if not product_ids:
+            return {}
+        rows = db.session.execute(
+            db.select(
+                cls.id, cls.name, cls.sku, cls.quantity, cls.units_per_pack,
+                cls.full_price.label('price_full'),
+                cls.calculated_half_price.label('price_half'),
+                cls.quarter_price.label('price_quarter'),
+                cls.calculated_unit_price.label('price_unit'),
+                cls.profit_per_full.label('profit_full'),
+                cls.profit_per_half.label('profit_half'),
+                cls.profit_per_quarter.label('profit_quarter'),
+                cls.profit_per_unit.label('profit_unit')
+            ).where(cls.id.in_(product_ids))
+        )
+        return {row.id: row for row in rows}
+    
     def calculate_inventory_deduction(self, quantity, unit_type):
         """
         Calculate how many packs to deduct from inventory based on unit type
@@ -324,48 +498,68 @@ class Product(db.Model):
             # Default: treat as full pack
             return Decimal(str(quantity))
         
-    @property
+    @hybrid_property
     def is_low_stock(self):
         """Check if product is low on stock"""
         return self.quantity <= 5
     
-    @property
+    @hybrid_property
     def is_out_of_stock(self):
         """Check if product is out of stock"""
         return self.quantity <= 0
     
-    @property
+    @hybrid_property
     def quarter_price(self):
         """Calculate quarter price as 25% of full price"""
         return self.full_price / Decimal('4')
     
-    @property
+    @quarter_price.expression
+    def quarter_price(cls):
+        return cls.full_price / 4.0
+    
+    @hybrid_property
     def calculated_half_price(self):
         """Get half price, using stored value or calculating from full price"""
         return self.half_price if self.half_price else (self.full_price / Decimal('2'))
     
-    @property
+    @calculated_half_price.expression
+    def calculated_half_price(cls):
+        return func.coalesce(func.nullif(cls.half_price, 0), cls.full_price / 2.0)
+    
+    @hybrid_property
     def profit_per_quarter(self):
         """Calculate profit for quarter pack"""
         return self.quarter_price - (self.purchase_price / Decimal('4'))
     
-    @property
+    @profit_per_quarter.expression
+    def profit_per_quarter(cls):
+        return (cls.full_price - cls.purchase_price) / 4.0
+    
+    @hybrid_property
     def profit_per_half(self):
         """Calculate profit for half pack"""
         half_price = self.calculated_half_price
         return half_price - (self.purchase_price / Decimal('2'))
     
-    @property
+    @profit_per_half.expression
+    def profit_per_half(cls):
+        return cls.calculated_half_price - cls.purchase_price / 2.0
+    
+    @hybrid_property
     def profit_per_full(self):
         """Calculate profit for full pack"""
         return self.full_price - self.purchase_price
     
-    @property
+    @hybrid_property
     def profit_per_unit(self):
         """Calculate profit for single retail unit"""
         return self.get_profit_for_unit('unit')
     
-    @property
+    @profit_per_unit.expression
+    def profit_per_unit(cls):
+        return cls.calculated_unit_price - cls.cost_per_unit
+    
+    @hybrid_property
     def calculated_unit_price(self):
         """Get unit price, calculating if not set"""
         if self.unit_price:
@@ -373,14 +567,26 @@ class Product(db.Model):
         # Calculate from full price divided by units per pack
         return self.full_price / Decimal(str(self.units_per_pack))
     
-    @property
+    @calculated_unit_price.expression
+    def calculated_unit_price(cls):
+        return func.coalesce(func.nullif(cls.unit_price, 0), cls.full_price / (cls.units_per_pack * 1.0))
+    
+    @hybrid_property
     def cost_per_unit(self):
         """Calculate cost per single unit"""
         return self.purchase_price / Decimal(str(self.units_per_pack))
     
+    @cost_per_unit.expression
+    def cost_per_unit(cls):
+        return cls.purchase_price / (cls.units_per_pack * 1.0)
+    
     def __repr__(self):
         return f'<Product {self.sku}: {self.name}>'
 
+# The trigram indexes need pg_trgm before create_all() builds the product table
+event.listen(Product.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
 
 class Sale(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -395,11 +601,25 @@ class Sale(db.Model):
     change_given = db.Column(db.Numeric(10, 2), nullable=False, default=0.00)
     
     status = db.Column(db.String(20), nullable=False, server_default='completed')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=func.now())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=func.now())
 
+    __table_args__ = (
+        # Prefix LIKE on invoice numbers (INV{year}%) needs pattern ops on PostgreSQL
+        db.Index('ix_sale_invoice_number_pattern', 'invoice_number',
+                 postgresql_ops={'invoice_number': 'varchar_pattern_ops'}).ddl_if(dialect='postgresql'),
+        # Reports filter on status and a created_at range
+        db.Index('ix_sale_status_created_at', 'status', 'created_at'),
+        # Per-clerk sale lists and reports, newest first
+        db.Index('ix_sale_clerk_id_created_at', 'clerk_id', 'created_at'),
+        # Smaller PostgreSQL index for the common completed-sales reports
+        db.Index('ix_sale_completed_created_at', 'created_at',
+                 postgresql_where=db.text("status = 'completed'")).ddl_if(dialect='postgresql'),
+    )
+    
     # Relationships
-    sale_items = db.relationship('SaleItem', backref='sale', lazy=True, cascade='all, delete-orphan')
+    sale_items = db.relationship('SaleItem', backref='sale', lazy='select', cascade='all, delete-orphan')
     
     def __init__(self, **kwargs):
         super(Sale, self).__init__(**kwargs)
@@ -410,30 +630,83 @@ class Sale(db.Model):
     def generate_invoice_number():
         """Generate invoice number with pattern INV{YEAR}{6-digit-sequence}"""
         current_year = datetime.now().year
-        
-        latest_sale = db.session.query(Sale).filter(
-            Sale.invoice_number.like(f'INV{current_year}%')
-        ).order_by(Sale.invoice_number.desc()).first()
-        
-        if latest_sale:
-            sequence_str = latest_sale.invoice_number[-6:]
-            try:
-                sequence = int(sequence_str) + 1
-            except ValueError:
-                sequence = 1
-        else:
-            sequence = 1
+        sequence = InvoiceSequence.next_value(current_year)
         
         sequence_str = str(sequence).zfill(6)
         return f'INV{current_year}{sequence_str}'
     
+    @classmethod
+    def query_with_items(cls):
+        """
+        Sale query that loads sale_items and their products in two extra SELECTs
+        
+        Only the product columns that sale screens show or adjust are loaded;
+        anything else (description, prices, image) loads on first access.
+        """
+        return cls.query.options(
+            selectinload(cls.sale_items).selectinload(SaleItem.product).load_only(
+                Product.name, Product.sku, Product.quantity, Product.units_per_pack
+            )
+        )
+    
+    def adjust_inventory(self, direction):
+        """
+        Return this sale's items to stock (direction=1) or take them out
+        (direction=-1) with a single UPDATE over the affected products
+        """
+        packs = db.select(func.sum(SaleItem.inventory_deducted)).where(
+            SaleItem.sale_id == self.id,
+            SaleItem.product_id == Product.id
+        ).scalar_subquery()
+        db.session.execute(
+            db.update(Product).where(
+                Product.id.in_(db.select(SaleItem.product_id).where(SaleItem.sale_id == self.id))
+            ).values(quantity=Product.quantity + direction * packs),
+            execution_options={'synchronize_session': 'fetch'}
+        )
+    
+    def stock_shortage(self):
+        """
+        First product without enough stock to complete this sale
+        
+        Returns:
+            Row with name, quantity and needed (packs), or None
+        """
+        needed = func.sum(SaleItem.inventory_deducted)
+        return db.session.execute(
+            db.select(Product.name, Product.quantity, needed.label('needed'))
+            .join(SaleItem, SaleItem.product_id == Product.id)
+            .where(SaleItem.sale_id == self.id)
+            .group_by(Product.id, Product.name, Product.quantity)
+            .having(Product.quantity < needed)
+        ).first()
+    
+    @staticmethod
+    def bulk_profit(sale_ids):
+        """
+        Sum line profits for many sales in a single grouped query
+        
+        Returns:
+            dict: {sale_id: profit} for every sale that has items
+        """
+        if not sale_ids:
+            return {}
+        rows = db.session.query(
+            SaleItem.sale_id,
+            func.sum(SaleItem.quantity * (SaleItem.price_at_sale - SaleItem.cost_at_sale))
+        ).filter(
+            SaleItem.sale_id.in_(sale_ids)
+        ).group_by(SaleItem.sale_id).all()
+        return {sale_id: float(profit or 0) for sale_id, profit in rows}
+    
     @property
     def calculated_profit(self):
         """Calculate total profit for this sale"""
-        total = 0
-        for item in self.sale_items:
-            total += item.line_profit
-        return total
+        # Items already in memory are summed directly; otherwise let the
+        # database add them up rather than loading every row
+        if 'sale_items' in inspect(self).unloaded:
+            return Sale.bulk_profit([self.id]).get(self.id, 0.0)
+        return sum(item.line_profit for item in self.sale_items)
     
     @property
     def is_pending(self):
@@ -447,35 +720,219 @@ class Sale(db.Model):
     def is_cancelled(self):
         return self.status == 'cancelled'
     
-    @property
+    @hybrid_property
     def profit_margin_percentage(self):
         """Calculate overall profit margin percentage for this sale"""
         if float(self.total_amount) > 0:
             return (float(self.total_profit) / float(self.total_amount)) * 100
         return 0
     
+    @profit_margin_percentage.expression
+    def profit_margin_percentage(cls):
+        return case(
+            (cls.total_amount > 0, cls.total_profit * 100 / cls.total_amount),
+            else_=0
+        )
+    
+    def apply_to_rollups(self, sign):
+        """
+        Count this sale in (sign=1) or take it out of (sign=-1) the report
+        rollups; called whenever a sale becomes or stops being completed
+        """
+        ProductSalesDaily.apply_sale(self.id, sign)
+        SalesDaily.apply_sale(self.id, sign)
+    
     def __repr__(self):
         return f'<Sale {self.invoice_number}>'
 
 
+class InvoiceSequence(db.Model):
+    """Per-year counter backing Sale invoice numbers"""
+    __tablename__ = 'invoice_sequence'
+    
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_seq = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def next_value(cls, year):
+        """
+        Atomically increment and return the invoice sequence for a year
+        
+        Runs in the caller's transaction, so the number is only consumed
+        if the sale itself commits.
+        """
+        table = cls.__table__
+        
+        last_seq = db.session.execute(
+            table.update()
+            .where(table.c.year == year)
+            .values(last_seq=table.c.last_seq + 1)
+            .returning(table.c.last_seq)
+        ).scalar()
+        if last_seq is not None:
+            return last_seq
+        
+        # First invoice of the year: continue after any existing invoices
+        seed = db.select(
+            func.coalesce(func.max(cast(func.substr(Sale.invoice_number, 8), db.Integer)), 0) + 1
+        ).where(Sale.invoice_number.like(f'INV{year}%')).scalar_subquery()
+        
+        insert = _dialect_insert(table)
+        return db.session.execute(
+            insert.values(year=year, last_seq=seed)
+            .on_conflict_do_update(index_elements=[table.c.year],
+                                   set_={'last_seq': table.c.last_seq + 1})
+            .returning(table.c.last_seq)
+        ).scalar()
+
+
+class SkuSequence(db.Model):
+    """Per-category-prefix counter backing Product SKUs"""
+    __tablename__ = 'sku_sequence'
+    
+    prefix = db.Column(db.String(3), primary_key=True)
+    last_seq = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def next_value(cls, prefix, count=1):
+        """
+        Atomically reserve count SKU numbers for a prefix and return the last
+        
+        Concurrent callers each get their own block instead of racing on
+        MAX(sku) + 1; like InvoiceSequence it runs in the caller's transaction.
+        """
+        table = cls.__table__
+        
+        last_seq = db.session.execute(
+            table.update()
+            .where(table.c.prefix == prefix)
+            .values(last_seq=table.c.last_seq + count)
+            .returning(table.c.last_seq)
+        ).scalar()
+        if last_seq is not None:
+            return last_seq
+        
+        # First SKU for this prefix: continue after any existing products
+        seed = db.select(
+            func.coalesce(func.max(cast(func.substr(Product.sku, 4), db.Integer)), 0) + count
+        ).where(
+            Product.sku.like(f'{prefix}%'),
+            Product.sku.regexp_match(f'^{prefix}[0-9]+$')
+        ).scalar_subquery()
+        
+        insert = _dialect_insert(table)
+        return db.session.execute(
+            insert.values(prefix=prefix, last_seq=seed)
+            .on_conflict_do_update(index_elements=[table.c.prefix],
+                                   set_={'last_seq': table.c.last_seq + count})
+            .returning(table.c.last_seq)
+        ).scalar()
+
+
+class ProductSalesDaily(db.Model):
+    """
+    Completed-sale totals per product per day
+    
+    Maintained by Sale.apply_to_rollups(), so product rankings read a few
+    rows per product and day instead of joining every sale item.
+    """
+    __tablename__ = 'product_sales_daily'
+    
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True, autoincrement=False)
+    quantity_sold = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    profit = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    
+    @classmethod
+    def apply_sale(cls, sale_id, sign):
+        """Add (sign=1) or subtract (sign=-1) one sale's items in a single upsert"""
+        table = cls.__table__
+        day = func.date(Sale.created_at, type_=db.Date)
+        
+        rows = db.select(
+            day,
+            SaleItem.product_id,
+            sign * func.sum(SaleItem.quantity),
+            sign * func.sum(SaleItem.price_at_sale * SaleItem.quantity),
+            sign * func.sum((SaleItem.price_at_sale - SaleItem.cost_at_sale) * SaleItem.quantity)
+        ).join(Sale, Sale.id == SaleItem.sale_id).where(
+            SaleItem.sale_id == sale_id
+        ).group_by(day, SaleItem.product_id)
+        
+        insert = _dialect_insert(table).from_select(
+            ['day', 'product_id', 'quantity_sold', 'revenue', 'profit'], rows
+        )
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.product_id],
+            set_={name: table.c[name] + insert.excluded[name]
+                  for name in ('quantity_sold', 'revenue', 'profit')}
+        ))
+
+
+class SalesDaily(db.Model):
+    """
+    Completed-sale totals per day
+    
+    Maintained by Sale.apply_to_rollups() next to ProductSalesDaily, so the
+    profits dashboard reads one row per day instead of scanning every sale.
+    """
+    __tablename__ = 'sales_daily'
+    
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    profit = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def apply_sale(cls, sale_id, sign):
+        """Add (sign=1) or subtract (sign=-1) one sale's totals in a single upsert"""
+        table = cls.__table__
+        
+        row = db.select(
+            func.date(Sale.created_at, type_=db.Date),
+            sign * Sale.total_amount,
+            sign * Sale.total_profit,
+            literal(sign, db.Integer)
+        ).where(Sale.id == sale_id)
+        
+        insert = _dialect_insert(table).from_select(
+            ['day', 'revenue', 'profit', 'sales_count'], row
+        )
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=[table.c.day],
+            set_={name: table.c[name] + insert.excluded[name]
+                  for name in ('revenue', 'profit', 'sales_count')}
+        ))
+
+
 class SaleItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    sale_id = db.Column(db.Integer, db.ForeignKey('sale.id'), nullable=False)
+    sale_id = db.Column(db.Integer, db.ForeignKey('sale.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Numeric(10, 2), nullable=False)  # Allows for 0.5, 0.25, etc.
     unit_type = db.Column(db.String(10), nullable=False, default='full')  # full, half, quarter, unit
     price_at_sale = db.Column(db.Numeric(10, 2), nullable=False)
     cost_at_sale = db.Column(db.Numeric(10, 2), nullable=False, default=0.00)
+    units_per_pack_at_sale = db.Column(db.Integer, nullable=False, default=1)  # Pack size when sold
+    
+    UNIT_MAP = {
+        'full': 'Full Pack',
+        'half': 'Half Pack',
+        'quarter': 'Quarter Pack',
+        'unit': 'Retail Unit'
+    }
     
     @property
     def line_total(self):
         """Calculate total for this line item"""
-        return float(self.quantity * self.price_at_sale)
+        # Multiply as floats; Decimal * Decimal is far slower and the result is a float anyway
+        return float(self.quantity) * float(self.price_at_sale)
     
     @property
     def line_cost(self):
         """Calculate total cost for this line item"""
-        return float(self.quantity * self.cost_at_sale)
+        return float(self.quantity) * float(self.cost_at_sale)
     
     @property
     def line_profit(self):
@@ -485,26 +942,21 @@ class SaleItem(db.Model):
     @property
     def profit_margin_percentage(self):
         """Calculate profit margin as percentage"""
-        if self.line_total > 0:
-            return (self.line_profit / self.line_total) * 100
+        line_total = self.line_total
+        if line_total > 0:
+            return ((line_total - self.line_cost) / line_total) * 100
         return 0
     
     @property
     def unit_display(self):
         """Display unit type in a user-friendly way"""
-        unit_map = {
-            'full': 'Full Pack',
-            'half': 'Half Pack',
-            'quarter': 'Quarter Pack',
-            'unit': 'Retail Unit'
-        }
-        return unit_map.get(self.unit_type, 'Full Pack')
+        return self.UNIT_MAP.get(self.unit_type, 'Full Pack')
     
-    @property
+    @hybrid_property
     def inventory_deducted(self):
         """Calculate how much inventory was deducted for this sale item"""
         if self.unit_type == 'unit':
-            return float(self.quantity) / float(self.product.units_per_pack)
+            return float(self.quantity) / self.units_per_pack_at_sale
         elif self.unit_type == 'half':
             return float(self.quantity) * 0.5
         elif self.unit_type == 'quarter':
@@ -512,6 +964,15 @@ class SaleItem(db.Model):
         else:  # full
             return float(self.quantity)
     
+    @inventory_deducted.expression
+    def inventory_deducted(cls):
+        return case(
+            (cls.unit_type == 'unit', cls.quantity / (cls.units_per_pack_at_sale * 1.0)),
+            (cls.unit_type == 'half', cls.quantity * 0.5),
+            (cls.unit_type == 'quarter', cls.quantity * 0.25),
+            else_=cls.quantity
+        )
+    
     def __repr__(self):
         return f'<SaleItem {self.id}: {self.quantity} x {self.unit_display} of {self.product.name}>'
 
@@ -522,7 +983,7 @@ class Expense(db.Model):
     category = db.Column(db.String(50), nullable=False)
     description = db.Column(db.String(200), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
-    date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date())
+    date = db.Column(db.Date, nullable=False, default=lambda: datetime.utcnow().date())
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receipt_number = db.Column(db.String(50))
     notes = db.Column(db.Text)
@@ -533,8 +994,9 @@ class Expense(db.Model):
     document_size = db.Column(db.Integer)
     document_type = db.Column(db.String(100))
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=func.now())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=func.now())
     
     CATEGORIES = [
         ('rent', 'Rent'),
@@ -548,6 +1010,13 @@ class Expense(db.Model):
         ('professional', 'Professional Services'),
         ('other', 'Other')
     ]
+    CATEGORIES_MAP = dict(CATEGORIES)
+    
+    __table_args__ = (
+        _category_check('ck_expense_category', CATEGORIES),
+        # Expense lists and the sales report filter on a date range
+        db.Index('ix_expense_date', 'date'),
+    )
     
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx'}
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
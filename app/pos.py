@@ -1,31 +1,105 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response, current_app, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, session, send_file
 from flask_login import login_required, current_user
-from app.models import Product, Sale, SaleItem, Expense
+from app.models import Product, Sale, SaleItem, Expense, User, ProductSalesDaily, SalesDaily
 from app.decorators import manager_required, role_required
-from app import db
+from app.http_cache import not_modified, validated
+from app import db, cache
 from decimal import Decimal
 from app.forms import SaleStatusForm
 from datetime import datetime, date, timedelta
 import io
+import hashlib
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils.dataframe import dataframe_to_rows
-from sqlalchemy import func, and_, text
+from sqlalchemy import func, and_, case, text
+from sqlalchemy.orm import joinedload, load_only, selectinload
 
 bp = Blueprint('pos', __name__)
 
+# Share of a full pack taken by each fractional unit type
+_PACK_FRACTIONS = {'full': 1, 'half': 0.5, 'quarter': 0.25}
+
+def _sale_query():
+    """Sales with their items, item products and the clerk's username in one go"""
+    return Sale.query_with_items().options(joinedload(Sale.clerk).load_only(User.username))
+
+def _completed_between(start, end):
+    """Filter for completed sales created within [start, end]"""
+    return and_(
+        Sale.created_at >= start,
+        Sale.created_at <= end,
+        Sale.status == 'completed'
+    )
+
+def _report_version(sales_filter=None, expense_filter=None, products=False):
+    """
+    Version of the data behind a report, from cheap version queries
+    
+    Row counts catch deletes and the latest updated_at catches edits, so the
+    version changes whenever the data behind the report can have changed.
+    """
+    sales = db.session.query(func.count(Sale.id), func.max(Sale.updated_at))
+    if sales_filter is not None:
+        sales = sales.filter(sales_filter)
+    version = [tuple(sales.one())]
+    if expense_filter is not None:
+        version.append(tuple(db.session.query(
+            func.count(Expense.id), func.max(Expense.updated_at)
+        ).filter(expense_filter).one()))
+    if products:
+        version.append(db.session.query(func.max(Product.updated_at)).scalar())
+    return hashlib.md5(repr(version).encode()).hexdigest()
+
+def _report_etag(*parts, version=None, sales_filter=None, expense_filter=None, products=False):
+    """
+    ETag for a report page or export, from its data version
+    
+    Pass a version already taken with _report_version() to reuse it; the
+    current user is included as pages carry per-user navigation.
+    """
+    if version is None:
+        version = _report_version(sales_filter, expense_filter, products)
+    return hashlib.md5(repr([current_user.id, parts, version]).encode()).hexdigest()
+
 @bp.route('/')
 @login_required
 def pos_page():
-    products = Product.query.filter(Product.quantity > 0).order_by(Product.name).all()
+    product_grid = _render_product_grid()
 
     # Check if we're continuing a sale
     continue_sale_id = session.get('continue_sale_id')
     if continue_sale_id:
         session.pop('continue_sale_id', None)
-        return render_template('pos/pos.html', products=products, continue_sale_id=continue_sale_id)
+        return render_template('pos/pos.html', product_grid=product_grid, continue_sale_id=continue_sale_id)
+    
+    return render_template('pos/pos.html', product_grid=product_grid)
+
+def _render_product_grid():
+    """
+    Rendered product cards for the POS page, cached per catalogue version
+    
+    The cache key carries the latest product update time and the number of
+    products in stock, so any sale, restock or edit produces a fresh key and
+    the grid is rebuilt on the next page load.
+    """
+    last_update, in_stock = db.session.execute(
+        db.select(func.max(Product.updated_at), func.count(Product.id)).where(Product.quantity > 0)
+    ).one()
+    cache_key = f'pos_product_grid:{last_update}:{in_stock}'
     
-    return render_template('pos/pos.html', products=products)
+    product_grid = cache.get(cache_key)
+    if product_grid is None:
+        products = Product.query.options(load_only(
+            Product.name, Product.sku, Product.quantity, Product.units_per_pack,
+            Product.purchase_price, Product.full_price, Product.half_price, Product.unit_price,
+            Product.image_src
+        )).filter(Product.quantity > 0).order_by(Product.name).all()
+        product_grid = render_template('pos/product_grid.html', products=products)
+        cache.set(cache_key, product_grid)
+    return product_grid
 
 @bp.route('/preview', methods=['POST'])
 @login_required
@@ -36,38 +110,49 @@ def checkout_preview():
         if not items:
             return jsonify({'error': 'No items in cart'}), 400
         
+        # Prices and profits for every cart line come back from one query
+        pricing = Product.cart_pricing({int(item['product_id']) for item in items})
+        
         preview_items = []
-        total = Decimal('0.00')
-        total_profit = Decimal('0.00')
+        total = 0.0
+        total_profit = 0.0
         
         for item in items:
             product_id = int(item['product_id'])
             quantity = int(item['quantity'])
             unit_type = item.get('unit_type', 'full')
             
-            product = Product.query.get(product_id)
+            product = pricing.get(product_id)
             if not product:
                 return jsonify({'error': f'Product not found'}), 400
             
-            # Calculate inventory needed using the new method
-            inventory_needed = product.calculate_inventory_deduction(quantity, unit_type)
+            available_stock = float(product.quantity)
+            total_units_available = available_stock * product.units_per_pack
+            
+            # Packs needed, as in Product.calculate_inventory_deduction
+            if unit_type == 'unit':
+                price_key = 'unit'
+                inventory_needed = quantity / product.units_per_pack if product.units_per_pack > 0 else quantity
+            else:
+                price_key = unit_type if unit_type in _PACK_FRACTIONS else 'full'
+                inventory_needed = quantity * _PACK_FRACTIONS[price_key]
             
-            if product.quantity < inventory_needed:
+            if available_stock < inventory_needed:
                 if unit_type == 'unit':
                     return jsonify({
                         'error': f'Insufficient stock for {product.name}. '
-                                f'Need {quantity} units, have {int(product.total_units_available)} units available'
+                                f'Need {quantity} units, have {int(total_units_available)} units available'
                     }), 400
                 else:
                     return jsonify({
                         'error': f'Insufficient stock for {product.name}. Available: {product.quantity}'
                     }), 400
             
-            price = product.get_price_for_unit(unit_type)
-            line_total = Decimal(str(price)) * quantity
+            price = float(getattr(product, f'price_{price_key}'))
+            line_total = price * quantity
             total += line_total
             
-            line_profit = Decimal(str(product.get_profit_for_unit(unit_type))) * quantity
+            line_profit = float(getattr(product, f'profit_{price_key}')) * quantity
             total_profit += line_profit
             
             preview_items.append({
@@ -75,19 +160,19 @@ def checkout_preview():
                 'product_name': product.name,
                 'sku': product.sku,
                 'unit_type': unit_type,
-                'price': float(price),
+                'price': price,
                 'quantity': quantity,
-                'line_total': float(line_total),
-                'line_profit': float(line_profit),
-                'available_stock': float(product.quantity),
-                'available_units': int(product.total_units_available) if unit_type == 'unit' else None
+                'line_total': line_total,
+                'line_profit': line_profit,
+                'available_stock': available_stock,
+                'available_units': int(total_units_available) if unit_type == 'unit' else None
             })
         
         return jsonify({
             'success': True,
             'items': preview_items,
-            'total': float(total),
-            'total_profit': float(total_profit),
+            'total': total,
+            'total_profit': total_profit,
             'item_count': len(preview_items)
         })
     
@@ -127,16 +212,25 @@ def checkout():
         continuing_sale_id = session.get('continue_sale_id')
 
         # STEP 1: Calculate total and validate stock FIRST (before any database changes)
-        total = Decimal('0.00')
-        total_profit = Decimal('0.00')
+        total = 0.0
+        total_profit = 0.0
         validated_items = []
         
+        # Load and lock every product in the cart with one query so stock
+        # cannot change between the check below and the deduction. Locks are
+        # taken in id order so two overlapping carts cannot deadlock.
+        product_ids = {int(item['product_id']) for item in items}
+        products = {
+            p.id: p for p in Product.query.filter(Product.id.in_(product_ids))
+                                          .order_by(Product.id).with_for_update()
+        }
+        
         for item in items:
             product_id = int(item['product_id'])
             quantity = int(item['quantity'])
             unit_type = item.get('unit_type', 'full')
             
-            product = Product.query.get(product_id)
+            product = products.get(product_id)
             if not product:
                 raise ValueError(f'Product not found')
             
@@ -158,20 +252,14 @@ def checkout():
                         f'Need {inventory_deduction} packs, have {product.quantity}'
                     )
             
-            # Get price and cost basis
-            price = product.get_price_for_unit(unit_type)
-            
-            if unit_type == 'unit':
-                cost_basis = product.purchase_price / Decimal(str(product.units_per_pack))
-            elif unit_type == 'half':
-                cost_basis = product.purchase_price / Decimal('2')
-            elif unit_type == 'quarter':
-                cost_basis = product.purchase_price / Decimal('4')
-            else:  # full
-                cost_basis = product.purchase_price
+
+            # Get price and cost basis; money is handled as float and only
+            # rounded to cents once the totals are known
+            price = float(product.get_price_for_unit(unit_type))
+            cost_basis = float(product.get_cost_for_unit(unit_type))
             
-            line_total = Decimal(str(price)) * quantity
-            line_profit = (Decimal(str(price)) - Decimal(str(cost_basis))) * quantity
+            line_total = price * quantity
+            line_profit = (price - cost_basis) * quantity
             
             total += line_total
             total_profit += line_profit
@@ -187,40 +275,42 @@ def checkout():
                 'inventory_deduction': inventory_deduction
             })
         
+        total = round(total, 2)
+        total_profit = round(total_profit, 2)
+        
         # STEP 2: Validate payment amount for completed sales BEFORE any changes
-        if sale_status == 'completed' and amount_paid < total:
+        if sale_status == 'completed' and float(amount_paid) < total:
             return jsonify({
-                'error': f'Payment amount (GHS {float(amount_paid):.2f}) is less than total amount (GHS {float(total):.2f})'
+                'error': f'Payment amount (GHS {float(amount_paid):.2f}) is less than total amount (GHS {total:.2f})'
             }), 400
         
         # STEP 3: Now proceed with sale creation/update
         if continuing_sale_id:
-            sale = Sale.query.get(continuing_sale_id)
+            sale = db.session.get(Sale, continuing_sale_id)
             if not sale or sale.status != 'pending':
                 return jsonify({'error': 'Invalid pending sale'}), 400
             
             if current_user.role == 'cashier' and sale.clerk_id != current_user.id:
                 return jsonify({'error': 'Access denied'}), 403
             
-            # Restore inventory from previous sale items
-            for item in sale.sale_items:
-                inventory_to_restore = item.product.calculate_inventory_deduction(
-                    item.quantity, item.unit_type
-                )
-                item.product.quantity += inventory_to_restore
-                db.session.delete(item)
+            # Restore inventory from previous sale items, then clear them;
+            # one UPDATE and one DELETE whatever the size of the old cart
+            sale.adjust_inventory(1)
+            db.session.execute(db.delete(SaleItem).where(SaleItem.sale_id == sale.id))
             
             sale.payment_method = payment_method
             sale.amount_paid = amount_paid
             sale.change_given = change_given
             sale.status = sale_status
+            sale.total_amount = total
+            sale.total_profit = total_profit
             
             session.pop('continue_sale_id', None)
         else:
             sale = Sale(
                 clerk_id=current_user.id, 
-                total_amount=0,
-                total_profit=Decimal('0.00'),
+                total_amount=total,
+                total_profit=total_profit,
                 status=sale_status,
                 payment_method=payment_method,
                 amount_paid=amount_paid,
@@ -231,36 +321,46 @@ def checkout():
         db.session.flush()
         
         # STEP 4: Process validated items and update inventory
+        sale_item_rows = []
+        deductions = {}
         for item_data in validated_items:
             product = item_data['product']
             
-            # Update stock only if sale is completed
-            if sale_status == 'completed':
-                product.quantity -= item_data['inventory_deduction']
+            # A product can sit on several cart lines (e.g. full and half packs)
+            deductions[product.id] = deductions.get(product.id, 0) + item_data['inventory_deduction']
             
-            # Create sale item
-            sale_item = SaleItem(
-                sale=sale,
-                product=product,
-                quantity=item_data['quantity'],
-                unit_type=item_data['unit_type'],
-                price_at_sale=item_data['price'],
-                cost_at_sale=item_data['cost_basis']
-            )
-            db.session.add(sale_item)
+            sale_item_rows.append({
+                'sale_id': sale.id,
+                'product_id': product.id,
+                'quantity': item_data['quantity'],
+                'unit_type': item_data['unit_type'],
+                'price_at_sale': item_data['price'],
+                'cost_at_sale': item_data['cost_basis'],
+                'units_per_pack_at_sale': product.units_per_pack
+            })
+        
+        # Totals were set on the sale above; the items go in as one batch
+        db.session.execute(db.insert(SaleItem), sale_item_rows)
         
-        # Update sale totals
-        sale.total_amount = float(total)
-        sale.total_profit = float(total_profit)
+        # Update stock only if sale is completed, with one UPDATE for the cart
+        if sale_status == 'completed':
+            db.session.execute(
+                db.update(Product).where(Product.id.in_(deductions)).values(
+                    quantity=Product.quantity - case(deductions, value=Product.id)
+                ),
+                execution_options={'synchronize_session': 'fetch'}
+            )
+            sale.apply_to_rollups(1)
         
         db.session.commit()
+        invalidate_sales_reports()
         
         return jsonify({
             'success': True,
             'sale_id': sale.id,
             'invoice_number': sale.invoice_number,
-            'total': float(total),
-            'total_profit': float(total_profit),
+            'total': total,
+            'total_profit': total_profit,
             'payment_method': payment_method,
             'amount_paid': float(amount_paid),
             'change_given': float(change_given),
@@ -277,7 +377,7 @@ def checkout():
 @manager_required
 def update_sale_status(sale_id):
     """Update sale status with CORRECT fractional inventory adjustments"""
-    sale = Sale.query.get_or_404(sale_id)
+    sale = _sale_query().get_or_404(sale_id)
     form = SaleStatusForm(obj=sale)
     
     if form.validate_on_submit():
@@ -288,30 +388,22 @@ def update_sale_status(sale_id):
         if old_status != new_status:
             if old_status == 'completed' and new_status in ['pending', 'cancelled']:
                 # Return items to inventory
-                for item in sale.sale_items:
-                    inventory_to_restore = item.product.calculate_inventory_deduction(
-                        item.quantity, item.unit_type
-                    )
-                    item.product.quantity += inventory_to_restore
+                sale.adjust_inventory(1)
+                sale.apply_to_rollups(-1)
             
             elif old_status in ['pending', 'cancelled'] and new_status == 'completed':
-                # Remove items from inventory
-                for item in sale.sale_items:
-                    inventory_to_deduct = item.product.calculate_inventory_deduction(
-                        item.quantity, item.unit_type
-                    )
-                    
-                    if item.product.quantity < inventory_to_deduct:
-                        if item.unit_type == 'unit':
-                            flash(f'Insufficient stock for {item.product.name}. Need {item.quantity} units, have {int(item.product.total_units_available)} units. Cannot complete sale.', 'error')
-                        else:
-                            flash(f'Insufficient stock for {item.product.name}. Need {inventory_to_deduct} packs, have {item.product.quantity}. Cannot complete sale.', 'error')
-                        return redirect(url_for('pos.update_sale_status', sale_id=sale_id))
-                    
-                    item.product.quantity -= inventory_to_deduct
+                # Check every product at once before removing items from inventory
+                shortage = sale.stock_shortage()
+                if shortage:
+                    flash(f'Insufficient stock for {shortage.name}. Need {float(shortage.needed):.2f} packs, have {shortage.quantity}. Cannot complete sale.', 'error')
+                    return redirect(url_for('pos.update_sale_status', sale_id=sale_id))
+                
+                sale.adjust_inventory(-1)
+                sale.apply_to_rollups(1)
         
         sale.status = new_status
         db.session.commit()
+        invalidate_sales_reports()
         
         flash(f'Sale #{sale.id} status updated from {old_status} to {new_status}', 'success')
         return redirect(url_for('pos.list_sales'))
@@ -321,7 +413,7 @@ def update_sale_status(sale_id):
 @bp.route('/receipt/<int:sale_id>')
 @login_required
 def receipt(sale_id):
-    sale = Sale.query.get_or_404(sale_id)
+    sale = _sale_query().get_or_404(sale_id)
     return render_template('pos/receipt.html', sale=sale)
 
 @bp.route('/sales/report')
@@ -343,32 +435,42 @@ def sales_report():
     else:
         end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    # Get sales within date range
-    sales_query = Sale.query.filter(
-        and_(
-            Sale.created_at >= start_date,
-            Sale.created_at <= end_date,
-            Sale.status == 'completed'
-        )
+    version = _report_version(
+        sales_filter=_completed_between(start_date, end_date),
+        expense_filter=and_(Expense.date >= start_date, Expense.date <= end_date)
     )
+    etag = _report_etag(start_date, end_date, version=version)
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    return validated(render_template('pos/sales_report.html', 
+                         start_date=start_date, 
+                         end_date=end_date,
+                         **_sales_report_data(start_date, end_date, version)), etag)
+
+@cache.memoize()
+def _sales_report_data(start_date, end_date, version):
+    """
+    Aggregates behind the sales report, cached per date range and data version
     
-    # Calculate totals
-    total_sales = sales_query.count()
-    total_revenue = sales_query.with_entities(func.sum(Sale.total_amount)).scalar() or 0
-    total_profit = sales_query.with_entities(func.sum(Sale.total_profit)).scalar() or 0
+    The version is part of the cache key, so a worker whose cache missed an
+    invalidate_sales_reports() call still never serves stale figures; the
+    invalidation only frees the old entries early.
+    """
+    completed = _completed_between(start_date, end_date)
     
-    # Get daily revenue data
+    # Get daily revenue data; the period totals are summed from these rows
     daily_revenue = db.session.query(
-        func.date(Sale.created_at).label('date'),
+        func.date(Sale.created_at, type_=db.Date).label('date'),
         func.sum(Sale.total_amount).label('revenue'),
-        func.sum(Sale.total_profit).label('profit')
-    ).filter(
-        and_(
-            Sale.created_at >= start_date,
-            Sale.created_at <= end_date,
-            Sale.status == 'completed'
-        )
-    ).group_by(func.date(Sale.created_at)).order_by('date').all()
+        func.sum(Sale.total_profit).label('profit'),
+        func.count(Sale.id).label('sales_count')
+    ).filter(completed).group_by(func.date(Sale.created_at)).order_by('date').all()
+    
+    total_sales = sum(row.sales_count for row in daily_revenue)
+    total_revenue = sum(row.revenue or 0 for row in daily_revenue)
+    total_profit = sum(row.profit or 0 for row in daily_revenue)
     
     # Get daily expenses data
     daily_expenses = db.session.query(
@@ -387,12 +489,11 @@ def sales_report():
     # Combine revenue and expense data
     daily_data = []
     for row in daily_revenue:
-        date_obj = row.date if isinstance(row.date, date) else datetime.strptime(row.date, '%Y-%m-%d').date()
         daily_data.append({
-            'date': date_obj.strftime('%Y-%m-%d'),
+            'date': row.date.isoformat(),
             'revenue': float(row.revenue),
             'profit': float(row.profit),
-            'expense': expense_dict.get(date_obj, 0.0)
+            'expense': expense_dict.get(row.date, 0.0)
         })
     
     # Calculate total expenses in period
@@ -408,38 +509,31 @@ def sales_report():
         func.sum(SaleItem.quantity).label('total_quantity'),
         func.sum(SaleItem.price_at_sale * SaleItem.quantity).label('total_revenue'),
         func.sum((SaleItem.price_at_sale - SaleItem.cost_at_sale) * SaleItem.quantity).label('total_profit')
-    ).join(Sale).filter(
-        and_(
-            Sale.created_at >= start_date,
-            Sale.created_at <= end_date,
-            Sale.status == 'completed'
-        )
-    ).group_by(SaleItem.unit_type).all()
+    ).join(Sale).filter(completed).group_by(SaleItem.unit_type).all()
     
     # Get payment method breakdown
     payment_stats = db.session.query(
         Sale.payment_method,
         func.count(Sale.id).label('count'),
         func.sum(Sale.total_amount).label('total_amount')
-    ).filter(
-        and_(
-            Sale.created_at >= start_date,
-            Sale.created_at <= end_date,
-            Sale.status == 'completed'
-        )
-    ).group_by(Sale.payment_method).all()
+    ).filter(completed).group_by(Sale.payment_method).all()
     
-    return render_template('pos/sales_report.html', 
-                         start_date=start_date, 
-                         end_date=end_date,
-                         total_sales=total_sales,
-                         total_revenue=total_revenue,
-                         total_profit=total_profit,
-                         total_expenses=total_expenses,
-                         net_profit=net_profit,
-                         daily_data=daily_data,
-                         unit_type_stats=unit_type_stats,
-                         payment_stats=payment_stats)
+    # Plain dicts so the result can live in any cache backend
+    return {
+        'total_sales': total_sales,
+        'total_revenue': total_revenue,
+        'total_profit': total_profit,
+        'total_expenses': total_expenses,
+        'net_profit': net_profit,
+        'daily_data': daily_data,
+        'unit_type_stats': [row._asdict() for row in unit_type_stats],
+        'payment_stats': [row._asdict() for row in payment_stats]
+    }
+
+def invalidate_sales_reports():
+    """Drop cached report data after sales, expenses or products change"""
+    cache.delete_memoized(_sales_report_data)
+    cache.delete_memoized(_profits_dashboard_data)
 
 @bp.route('/export-sales-excel')
 @login_required
@@ -453,92 +547,135 @@ def export_sales_excel():
         if status_filter != 'all':
             query = query.filter(Sale.status == status_filter)
         
-        sales = query.order_by(Sale.created_at.desc()).all()
-        
-        if not sales:
+        # Re-downloads of unchanged data skip building the workbook
+        etag = _report_etag(
+            status_filter,
+            sales_filter=Sale.status == status_filter if status_filter != 'all' else None,
+            products=True
+        )
+        unchanged = not_modified(etag)
+        if unchanged:
+            return unchanged
+        
+        # Summary row figures and the widest value of each text column come
+        # straight from the database, so the sheet can be written in one pass
+        (sale_count, total_amount, total_paid, total_change,
+         invoice_width, payment_width, status_width, clerk_width) = query.join(User, Sale.clerk).with_entities(
+            func.count(Sale.id),
+            func.coalesce(func.sum(Sale.total_amount), 0),
+            func.coalesce(func.sum(Sale.amount_paid), 0),
+            func.coalesce(func.sum(Sale.change_given), 0),
+            func.max(func.length(Sale.invoice_number)),
+            func.max(func.length(Sale.payment_method)),
+            func.max(func.length(Sale.status)),
+            func.max(func.length(User.username))
+        ).one()
+        
+        if not sale_count:
             flash('No sales data to export', 'warning')
             return redirect(url_for('pos.list_sales'))
         
-        wb = Workbook()
-        ws = wb.active
-        ws.title = f"Sales Report - {status_filter.title()}"
+        (total_items, name_width, sku_width,
+         max_quantity, max_price, max_line_total) = query.join(SaleItem).join(Product).with_entities(
+            func.count(SaleItem.id),
+            func.max(func.length(Product.name)),
+            func.max(func.length(Product.sku)),
+            func.max(SaleItem.quantity),
+            func.max(SaleItem.price_at_sale),
+            func.max(SaleItem.price_at_sale * SaleItem.quantity)
+        ).one()
+        
+        # Sales are streamed in batches; each batch's items and products are
+        # selectin-loaded and written out, so finished batches can be released
+        sales = query.options(
+            selectinload(Sale.sale_items).selectinload(SaleItem.product).load_only(Product.name, Product.sku),
+            joinedload(Sale.clerk).load_only(User.username)
+        ).order_by(Sale.created_at.desc()).yield_per(500)
         
         headers = [
             'Date', 'Time', 'Invoice Number', 'Items Count', 'Total Amount', 
             'Amount Paid', 'Change Given', 'Payment Method', 'Status', 'Clerk',
             'Product Name', 'SKU', 'Unit Type', 'Quantity', 'Unit Price', 'Line Total'
         ]
-        
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        row = 2
+        totals = ('TOTALS:', None, None, total_items, float(total_amount), float(total_paid), float(total_change)) + (None,) * 9
+        
+        def number_width(value):
+            return len(str(float(value or 0)))
+        
+        # A write-only sheet emits its column widths before the first row, so
+        # they are taken from the aggregates above rather than the rows
+        value_widths = (
+            len('YYYY-MM-DD'), len('HH:MM:SS'), invoice_width, len(str(total_items)),
+            number_width(total_amount), number_width(total_paid), number_width(total_change),
+            payment_width, status_width, clerk_width, name_width, sku_width,
+            max(len(unit) for unit in SaleItem.UNIT_MAP.values()),
+            len(str(max_quantity)), number_width(max_price), number_width(max_line_total)
+        )
+        col_widths = [max(len(header), width or 0) for header, width in zip(headers, value_widths)]
+        
+        # Write-only mode streams rows to the file instead of keeping a cell
+        # object per value; styled rows are built from WriteOnlyCell
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title=f"Sales Report - {status_filter.title()}")
+        
+        for i, width in enumerate(col_widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = min(width + 2, 50)
+        
+        def styled_row(values, font, fill, alignment=None):
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.font = font
+                cell.fill = fill
+                if alignment:
+                    cell.alignment = alignment
+                cells.append(cell)
+            return cells
+        
+        ws.append(styled_row(
+            headers,
+            Font(bold=True, color='FFFFFF'),
+            PatternFill(start_color='366092', end_color='366092', fill_type='solid'),
+            Alignment(horizontal='center', vertical='center')
+        ))
+        
+        # Sale columns are only filled on the first line of each sale
+        blank_sale = (None,) * 10
         for sale in sales:
-            if sale.sale_items:
+            items_count = len(sale.sale_items)
+            
+            sale_columns = (
+                sale.created_at.strftime('%Y-%m-%d'),
+                sale.created_at.strftime('%H:%M:%S'),
+                sale.invoice_number,
+                items_count,
+                float(sale.total_amount),
+                float(sale.amount_paid),
+                float(sale.change_given),
+                sale.payment_method.title(),
+                sale.status.title(),
+                sale.clerk.username
+            )
+            
+            if items_count:
                 for i, item in enumerate(sale.sale_items):
-                    if i == 0:
-                        ws.cell(row=row, column=1, value=sale.created_at.strftime('%Y-%m-%d'))
-                        ws.cell(row=row, column=2, value=sale.created_at.strftime('%H:%M:%S'))
-                        ws.cell(row=row, column=3, value=sale.invoice_number)
-                        ws.cell(row=row, column=4, value=len(sale.sale_items))
-                        ws.cell(row=row, column=5, value=float(sale.total_amount))
-                        ws.cell(row=row, column=6, value=float(sale.amount_paid))
-                        ws.cell(row=row, column=7, value=float(sale.change_given))
-                        ws.cell(row=row, column=8, value=sale.payment_method.title())
-                        ws.cell(row=row, column=9, value=sale.status.title())
-                        ws.cell(row=row, column=10, value=sale.clerk.username)
-                    
-                    ws.cell(row=row, column=11, value=item.product.name)
-                    ws.cell(row=row, column=12, value=item.product.sku)
-                    ws.cell(row=row, column=13, value=item.unit_display)
-                    ws.cell(row=row, column=14, value=item.quantity)
-                    ws.cell(row=row, column=15, value=float(item.price_at_sale))
-                    ws.cell(row=row, column=16, value=float(item.line_total))
-                    
-                    row += 1
+                    ws.append((sale_columns if i == 0 else blank_sale) + (
+                        item.product.name,
+                        item.product.sku,
+                        item.unit_display,
+                        item.quantity,
+                        float(item.price_at_sale),
+                        float(item.line_total)
+                    ))
             else:
-                ws.cell(row=row, column=1, value=sale.created_at.strftime('%Y-%m-%d'))
-                ws.cell(row=row, column=2, value=sale.created_at.strftime('%H:%M:%S'))
-                ws.cell(row=row, column=3, value=sale.invoice_number)
-                ws.cell(row=row, column=4, value=0)
-                ws.cell(row=row, column=5, value=float(sale.total_amount))
-                ws.cell(row=row, column=6, value=float(sale.amount_paid))
-                ws.cell(row=row, column=7, value=float(sale.change_given))
-                ws.cell(row=row, column=8, value=sale.payment_method.title())
-                ws.cell(row=row, column=9, value=sale.status.title())
-                ws.cell(row=row, column=10, value=sale.clerk.username)
-                row += 1
-        
-        summary_row = row + 1
-        ws.cell(row=summary_row, column=1, value="TOTALS:")
-        ws.cell(row=summary_row, column=4, value=sum(len(sale.sale_items) for sale in sales))
-        ws.cell(row=summary_row, column=5, value=sum(float(sale.total_amount) for sale in sales))
-        ws.cell(row=summary_row, column=6, value=sum(float(sale.amount_paid) for sale in sales))
-        ws.cell(row=summary_row, column=7, value=sum(float(sale.change_given) for sale in sales))
-        
-        for col in range(1, 17):
-            cell = ws.cell(row=summary_row, column=col)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color='E7E6E6', end_color='E7E6E6', fill_type='solid')
-        
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+                ws.append(sale_columns)
+        
+        ws.append(())
+        ws.append(styled_row(
+            totals,
+            Font(bold=True),
+            PatternFill(start_color='E7E6E6', end_color='E7E6E6', fill_type='solid')
+        ))
         
         output = io.BytesIO()
         wb.save(output)
@@ -546,11 +683,13 @@ def export_sales_excel():
         
         filename = f"sales_report_{status_filter}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
-        response = make_response(output.getvalue())
-        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        
-        return response
+        # Serve the buffer as a file instead of copying it out with getvalue()
+        return validated(send_file(
+            output,
+            as_attachment=True,
+            download_name=filename,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        ), etag)
         
     except Exception as e:
         current_app.logger.error(f"Export error: {str(e)}")
@@ -562,7 +701,7 @@ def export_sales_excel():
 def continue_sale(sale_id):
     """Continue shopping on a pending sale"""
     try:
-        sale = Sale.query.get_or_404(sale_id)
+        sale = db.get_or_404(Sale, sale_id)
         
         if sale.status != 'pending':
             flash('Can only continue pending sales', 'warning')
@@ -587,7 +726,7 @@ def continue_sale(sale_id):
 def load_pending_sale(sale_id):
     """API endpoint to load pending sale items into cart"""
     try:
-        sale = Sale.query.get_or_404(sale_id)
+        sale = Sale.query_with_items().get_or_404(sale_id)
         
         if sale.status != 'pending':
             return jsonify({'success': False, 'error': 'Sale is not pending'})
@@ -597,14 +736,12 @@ def load_pending_sale(sale_id):
         
         cart_items = []
         for item in sale.sale_items:
-            # Calculate available stock including reserved quantity
+            # Calculate available stock including reserved quantity, using the
+            # packs recorded on the item (the same figure checkout restores)
+            stock_value = float(item.product.quantity) + item.inventory_deducted
             if item.unit_type == 'unit':
-                reserved_packs = item.product.calculate_inventory_deduction(item.quantity, 'unit')
-                available_units = int((item.product.quantity + reserved_packs) * item.product.units_per_pack)
-                stock_value = item.product.quantity + reserved_packs
+                available_units = int(stock_value * item.product.units_per_pack)
             else:
-                reserved_packs = item.product.calculate_inventory_deduction(item.quantity, item.unit_type)
-                stock_value = item.product.quantity + reserved_packs
                 available_units = None
             
             cart_items.append({
@@ -642,7 +779,7 @@ def list_sales():
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', 'all')
     
-    query = Sale.query
+    query = _sale_query()
     
     if current_user.role == 'clerk':
         query = query.filter(Sale.clerk_id == current_user.id)
@@ -686,116 +823,83 @@ def profits_dashboard():
     # full end day (23:59:59) instead of cutting off at midnight.
     start_dt = datetime.combine(start_date, datetime.min.time())   # start_date 00:00:00
     end_dt   = datetime.combine(end_date,   datetime.max.time())   # end_date   23:59:59
+    completed = _completed_between(start_dt, end_dt)
 
-    total_sales_query = Sale.query.filter(
-        and_(
-            Sale.created_at >= start_dt,
-            Sale.created_at <= end_dt,
-            Sale.status == 'completed'
-        )
-    )
+    version = _report_version(sales_filter=completed, products=True)
+    etag = _report_etag(start_date, end_date, period, version=version)
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
 
-    total_revenue = total_sales_query.with_entities(func.sum(Sale.total_amount)).scalar() or 0
-    total_profit = total_sales_query.with_entities(func.sum(Sale.total_profit)).scalar() or 0
-    total_sales_count = total_sales_query.count()
+    return validated(render_template('pos/profits_dashboard.html',
+                         start_date=start_date,
+                         end_date=end_date,
+                         period=period,
+                         **_profits_dashboard_data(start_date, end_date, version)), etag)
 
-    total_cost = float(total_revenue) - float(total_profit)
-    profit_margin = (float(total_profit) / float(total_revenue) * 100) if total_revenue > 0 else 0.0
-    daily_profits_raw = db.session.query(
-        func.date(Sale.created_at).label('date'),
-        func.sum(Sale.total_amount).label('revenue'),
-        func.sum(Sale.total_profit).label('profit'),
-        func.count(Sale.id).label('sales_count')
+@cache.memoize()
+def _profits_dashboard_data(start_date, end_date, version):
+    """
+    Aggregates behind the profits dashboard, cached per date range and data version
+    
+    Keyed on the same version as the page ETag, like the sales report data;
+    invalidate_sales_reports() only clears superseded entries early.
+    """
+    start_dt = datetime.combine(start_date, datetime.min.time())
+    end_dt   = datetime.combine(end_date,   datetime.max.time())
+    completed = _completed_between(start_dt, end_dt)
+
+    # Per-day totals come straight from the rollup table and the KPI totals
+    # are summed from these rows. Days whose sales were all cancelled again
+    # keep a zero row there, so they are skipped.
+    daily_profits = db.session.query(
+        SalesDaily.day.label('date'),
+        SalesDaily.revenue.label('revenue'),
+        SalesDaily.profit.label('profit'),
+        SalesDaily.sales_count.label('sales_count')
     ).filter(
-        and_(
-            Sale.created_at >= start_dt,
-            Sale.created_at <= end_dt,
-            Sale.status == 'completed'
-        )
-    ).group_by(func.date(Sale.created_at)).order_by('date').all()
+        SalesDaily.day >= start_date,
+        SalesDaily.day <= end_date,
+        SalesDaily.sales_count > 0
+    ).order_by(SalesDaily.day).all()
 
-    daily_profits = []
-    for row in daily_profits_raw:
-        if isinstance(row.date, str):
-            date_obj = datetime.strptime(row.date, '%Y-%m-%d').date()
-        else:
-            date_obj = row.date
+    total_revenue = sum(row.revenue or 0 for row in daily_profits)
+    total_profit = sum(row.profit or 0 for row in daily_profits)
+    total_sales_count = sum(row.sales_count for row in daily_profits)
 
-        daily_profits.append({
-            'date': date_obj,
-            'revenue': row.revenue,
-            'profit': row.profit,
-            'sales_count': row.sales_count
-        })
+    total_cost = float(total_revenue) - float(total_profit)
+    profit_margin = (float(total_profit) / float(total_revenue) * 100) if total_revenue > 0 else 0.0
 
+    # Top products come from the per-day rollup rather than every sale item
     product_profits = db.session.query(
         Product.name.label('product_name'),
         Product.sku.label('sku'),
-        func.sum(SaleItem.quantity).label('quantity_sold'),
-        func.sum((SaleItem.price_at_sale - SaleItem.cost_at_sale) * SaleItem.quantity).label('total_profit'),
-        func.sum(SaleItem.price_at_sale * SaleItem.quantity).label('total_revenue')
-    ).join(Sale).join(Product).filter(
-        and_(
-            Sale.created_at >= start_dt,
-            Sale.created_at <= end_dt,
-            Sale.status == 'completed'
-        )
-    ).group_by(Product.id, Product.name, Product.sku).order_by(text('total_profit DESC')).limit(10).all()
+        func.sum(ProductSalesDaily.quantity_sold).label('quantity_sold'),
+        func.sum(ProductSalesDaily.profit).label('total_profit'),
+        func.sum(ProductSalesDaily.revenue).label('total_revenue')
+    ).join(Product).filter(
+        ProductSalesDaily.day >= start_date,
+        ProductSalesDaily.day <= end_date
+    ).group_by(Product.id, Product.name, Product.sku).having(
+        # Rollup rows of fully cancelled sales stay behind at zero
+        func.sum(ProductSalesDaily.quantity_sold) > 0
+    ).order_by(text('total_profit DESC')).limit(10).all()
 
     unit_profits = db.session.query(
         SaleItem.unit_type,
         func.sum(SaleItem.quantity).label('quantity_sold'),
         func.sum((SaleItem.price_at_sale - SaleItem.cost_at_sale) * SaleItem.quantity).label('total_profit'),
         func.sum(SaleItem.price_at_sale * SaleItem.quantity).label('total_revenue')
-    ).join(Sale).filter(
-        and_(
-            Sale.created_at >= start_dt,
-            Sale.created_at <= end_dt,
-            Sale.status == 'completed'
-        )
-    ).group_by(SaleItem.unit_type).all()
-
-    # BUG FIX: func.strftime('%Y-%m', ...) is SQLite-only and silently returns
-    # nothing on PostgreSQL/MySQL. Group on the Python side instead — works on
-    # every database without extra dependencies.
-    monthly_profits = []
-    if (end_date - start_date).days > 30:
-        monthly_raw = db.session.query(
-            Sale.created_at,
-            Sale.total_amount,
-            Sale.total_profit
-        ).filter(
-            and_(
-                Sale.created_at >= start_dt,
-                Sale.created_at <= end_dt,
-                Sale.status == 'completed'
-            )
-        ).all()
-
-        monthly_map = {}
-        for row in monthly_raw:
-            key = row.created_at.strftime('%Y-%m')
-            if key not in monthly_map:
-                monthly_map[key] = {'revenue': 0.0, 'profit': 0.0, 'sales_count': 0}
-            monthly_map[key]['revenue']      += float(row.total_amount or 0)
-            monthly_map[key]['profit']       += float(row.total_profit or 0)
-            monthly_map[key]['sales_count']  += 1
-
-        monthly_profits = [
-            {'month': k, **v}
-            for k, v in sorted(monthly_map.items())
-        ]
+    ).join(Sale).filter(completed).group_by(SaleItem.unit_type).all()
 
-    return render_template('pos/profits_dashboard.html',
-                         start_date=start_date,
-                         end_date=end_date,
-                         total_revenue=total_revenue,
-                         total_profit=total_profit,
-                         total_cost=total_cost,
-                         total_sales_count=total_sales_count,
-                         profit_margin=profit_margin,
-                         daily_profits=daily_profits,
-                         product_profits=product_profits,
-                         unit_profits=unit_profits,
-                         monthly_profits=monthly_profits,
-                         period=period)
\ No newline at end of file
+    # Plain dicts so the result can live in any cache backend
+    return {
+        'total_revenue': total_revenue,
+        'total_profit': total_profit,
+        'total_cost': total_cost,
+        'total_sales_count': total_sales_count,
+        'profit_margin': profit_margin,
+        'daily_profits': [row._asdict() for row in daily_profits],
+        'product_profits': [row._asdict() for row in product_profits],
+        'unit_profits': [row._asdict() for row in unit_profits]
+    }
\ No newline at end of file
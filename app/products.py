@@ -1,16 +1,19 @@
 # Update your products.py routes
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, make_response
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, Response, abort, current_app
 from flask_login import login_required, current_user
-from app.models import Product
+from app.models import Product, SaleItem, SkuSequence
 from app.forms import ProductForm
 from app.decorators import admin_required, manager_required
-from app import db
-from sqlalchemy import or_, func
-from decimal import Decimal
+from app import db, cache
+from app.pos import invalidate_sales_reports
+from app.http_cache import not_modified, validated
+from sqlalchemy import or_, and_, func, case, literal
+from decimal import Decimal, InvalidOperation
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import csv
+import hashlib
 import io
 import os
 
@@ -98,21 +101,46 @@ def list_products():
         page=page, per_page=20, error_out=False
     )
     
-    # Calculate stock values
-    total_stock_value = db.session.query(
-        func.sum(Product.purchase_price * Product.quantity)
-    ).scalar() or 0
+    return render_template('products/list.html', 
+                         products=products, 
+                         search=search,
+                         category_filter=category_filter,
+                         categories=Product.CATEGORIES,
+                         **_stock_stats())
+
+def _stock_stats():
+    """
+    Catalogue-wide stock totals for the products page, cached per catalogue version
     
-    total_retail_value = db.session.query(
-        func.sum(Product.full_price * Product.quantity)
-    ).scalar() or 0
+    The cache key carries the latest product update time and the product
+    count, like the POS product grid, so every worker rebuilds the totals
+    after any product change, sale or restock.
+    """
+    last_update, product_count = db.session.execute(
+        db.select(func.max(Product.updated_at), func.count(Product.id))
+    ).one()
+    cache_key = f'stock_stats:{last_update}:{product_count}'
     
-    potential_profit = float(total_retail_value) - float(total_stock_value)
+    stats = cache.get(cache_key)
+    if stats is None:
+        stats = _compute_stock_stats()
+        cache.set(cache_key, stats)
+    return stats
+
+def _compute_stock_stats():
+    """Stock value and count totals plus per-category figures"""
+    # Stock values and counts in one pass over the products table
+    stats = db.session.query(
+        func.coalesce(func.sum(Product.purchase_price * Product.quantity), 0),
+        func.coalesce(func.sum(Product.full_price * Product.quantity), 0),
+        func.count(Product.id),
+        func.coalesce(func.sum(case((Product.is_low_stock, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Product.quantity == 0, 1), else_=0)), 0)
+    ).one()
+    (total_stock_value, total_retail_value, total_products,
+     low_stock_count, out_of_stock_count) = stats
     
-    # Stock statistics
-    total_products = Product.query.count()
-    low_stock_count = Product.query.filter(Product.quantity <= 5).count()
-    out_of_stock_count = Product.query.filter(Product.quantity == 0).count()
+    potential_profit = float(total_retail_value) - float(total_stock_value)
     
     # Category statistics
     category_stats = db.session.query(
@@ -122,18 +150,15 @@ def list_products():
         func.sum(Product.purchase_price * Product.quantity).label('total_value')
     ).group_by(Product.category).all()
     
-    return render_template('products/list.html', 
-                         products=products, 
-                         search=search,
-                         category_filter=category_filter,
-                         categories=Product.CATEGORIES,
-                         total_stock_value=total_stock_value,
-                         total_retail_value=total_retail_value,
-                         potential_profit=potential_profit,
-                         total_products=total_products,
-                         low_stock_count=low_stock_count,
-                         out_of_stock_count=out_of_stock_count,
-                         category_stats=category_stats)
+    return {
+        'total_stock_value': total_stock_value,
+        'total_retail_value': total_retail_value,
+        'potential_profit': potential_profit,
+        'total_products': total_products,
+        'low_stock_count': low_stock_count,
+        'out_of_stock_count': out_of_stock_count,
+        'category_stats': [row._asdict() for row in category_stats]
+    }
 
 # Update the add_product and edit_product functions in products.py
 
@@ -182,8 +207,7 @@ def add_product():
                     # Save new image
                     image_info = save_product_image(form.product_image.data, product.id)
                     if image_info:
-                        product.image_filename = image_info['filename']
-                        product.image_path = image_info['path']
+                        product.set_image(image_info['filename'], image_info['path'])
                         print(f"DEBUG: Set product.image_filename = {product.image_filename}")
                         print(f"DEBUG: Set product.image_path = {product.image_path}")
                 except Exception as e:
@@ -193,6 +217,7 @@ def add_product():
             
             # Commit everything
             db.session.commit()
+            invalidate_sales_reports()
             
             success_message = f'Product "{product.name}" added successfully with SKU: {product.sku}!'
             if form.product_image.data and product.image_filename:
@@ -215,23 +240,16 @@ def add_product():
 #@admin_required
 @manager_required
 def edit_product(product_id):
-    product = Product.query.get_or_404(product_id)
+    product = db.get_or_404(Product, product_id)
     form = ProductForm(original_sku=product.sku, obj=product)
     
     if form.validate_on_submit():
         try:
             # Check if category changed - if so, generate new SKU
             if form.category.data != product.category:
+                # generate_sku draws the next number from the prefix's
+                # sequence, so the result is already free
                 new_sku = Product.generate_sku(form.category.data)
-                
-                counter = 1
-                original_sku = new_sku
-                while Product.query.filter_by(sku=new_sku).filter(Product.id != product.id).first():
-                    base = original_sku[:3]
-                    base_number = int(original_sku[3:])
-                    new_sku = f"{base}{(base_number + counter):04d}"
-                    counter += 1
-                
                 product.sku = new_sku
                 flash(f'Category changed - New SKU generated: {new_sku}', 'info')
             
@@ -247,8 +265,7 @@ def edit_product(product_id):
                     # Save new image
                     image_info = save_product_image(form.product_image.data, product.id)
                     if image_info:
-                        product.image_filename = image_info['filename']
-                        product.image_path = image_info['path']
+                        product.set_image(image_info['filename'], image_info['path'])
                         print(f"DEBUG: Updated product.image_filename = {product.image_filename}")
                         print(f"DEBUG: Updated product.image_path = {product.image_path}")
                         flash('Product image uploaded successfully!', 'success')
@@ -272,6 +289,7 @@ def edit_product(product_id):
             
             # Commit to database
             db.session.commit()
+            invalidate_sales_reports()
             
             flash(f'Product "{product.name}" updated successfully!', 'success')
             return redirect(url_for('products.list_products'))
@@ -305,45 +323,47 @@ def bulk_add_products():
             return redirect(request.url)
         
         try:
-            # Read CSV file
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
+            # Parse the upload as it is read instead of decoding it all up front
+            stream = io.TextIOWrapper(file.stream, encoding='utf-8', newline='')
             csv_reader = csv.DictReader(stream)
             
-            added_count = 0
+            rows = []
             errors = []
+            required = ('name', 'category', 'purchase_price', 'full_price')
+            valid_options = ', '.join(Product.CATEGORIES_MAP)
             
+            # Validate every row first, then insert the good ones in one batch
             for row_num, row in enumerate(csv_reader, start=2):
                 try:
                     # Validate required fields (no SKU needed)
-                    if not all([row.get('name'), row.get('category'), row.get('purchase_price'), row.get('full_price')]):
-                        errors.append(f"Row {row_num}: Missing required fields (name, category, purchase_price, full_price)")
+                    if not all(row.get(field) for field in required):
+                        errors.append(f"Row {row_num}: Missing required fields ({', '.join(required)})")
                         continue
                     
                     # Validate category
-                    valid_categories = [cat[0] for cat in Product.CATEGORIES]
-                    if row['category'] not in valid_categories:
-                        errors.append(f"Row {row_num}: Invalid category '{row['category']}'. Valid options: {', '.join(valid_categories)}")
+                    if row['category'] not in Product.CATEGORIES_MAP:
+                        errors.append(f"Row {row_num}: Invalid category '{row['category']}'. Valid options: {valid_options}")
                         continue
                     
-                    # Create product with auto-generated SKU
-                    product = Product.create_with_auto_sku(
-                        name=row['name'].strip(),
-                        category=row['category'],
-                        description=row.get('description', '').strip(),
-                        purchase_price=Decimal(str(row['purchase_price'])),
-                        full_price=Decimal(str(row['full_price'])),
-                        quantity=int(row.get('quantity', 0))
-                    )
-                    
-                    db.session.add(product)
-                    added_count += 1
+                    rows.append({
+                        'name': row['name'].strip(),
+                        'category': row['category'],
+                        'description': row.get('description', '').strip(),
+                        # CSV fields are already strings, so Decimal takes them as is
+                        'purchase_price': Decimal(row['purchase_price'].strip()),
+                        'full_price': Decimal(row['full_price'].strip()),
+                        'quantity': int((row.get('quantity') or '0').strip())
+                    })
                     
                 except ValueError as e:
                     errors.append(f"Row {row_num}: Invalid data format - {str(e)}")
                 except Exception as e:
                     errors.append(f"Row {row_num}: {str(e)}")
             
+            # SKUs are allocated per category from one lookup each
+            added_count = len(Product.bulk_create_with_auto_sku(rows))
             db.session.commit()
+            invalidate_sales_reports()
             
             if added_count > 0:
                 flash(f'Successfully added {added_count} products with auto-generated SKUs', 'success')
@@ -362,54 +382,117 @@ def bulk_add_products():
 @manager_required
 def download_csv_template():
     """Download CSV template for bulk upload"""
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header (no SKU field)
-    writer.writerow(['name', 'category', 'description', 'purchase_price', 'full_price', 'quantity'])
-    
-    # Write sample data with valid categories
-    writer.writerow(['Sample Electronics Item', 'electronics', 'Sample description', '10.00', '15.00', '100'])
-    writer.writerow(['Sample Clothing Item', 'clothing', 'Another description', '5.50', '8.25', '50'])
-    writer.writerow(['Sample Food Item', 'food', 'Food item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample beauty Item', 'beauty', 'beauty item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample books Item', 'books', 'books item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample home Item', 'home', 'home item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample sports Item', 'sports', 'sports item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample automotive Item', 'automotive', 'automotive item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample toys Item', 'toys', 'toys item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample health Item', 'health', 'health item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample jewelry Item', 'jewelry', 'jewelry item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample music Item', 'music', 'music item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample pets Item', 'pets', 'pets item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample office Item', 'office', 'office item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample tools Item', 'tools', 'tools item description', '2.00', '3.50', '200'])
-    writer.writerow(['Sample other Item', 'other', 'other item description', '2.00', '3.50', '200'])
+    rows = [
+        # Header (no SKU field)
+        ['name', 'category', 'description', 'purchase_price', 'full_price', 'quantity'],
+        # Sample data with valid categories
+        ['Sample Electronics Item', 'electronics', 'Sample description', '10.00', '15.00', '100'],
+        ['Sample Clothing Item', 'clothing', 'Another description', '5.50', '8.25', '50'],
+        ['Sample Food Item', 'food', 'Food item description', '2.00', '3.50', '200'],
+        ['Sample beauty Item', 'beauty', 'beauty item description', '2.00', '3.50', '200'],
+        ['Sample books Item', 'books', 'books item description', '2.00', '3.50', '200'],
+        ['Sample home Item', 'home', 'home item description', '2.00', '3.50', '200'],
+        ['Sample sports Item', 'sports', 'sports item description', '2.00', '3.50', '200'],
+        ['Sample automotive Item', 'automotive', 'automotive item description', '2.00', '3.50', '200'],
+        ['Sample toys Item', 'toys', 'toys item description', '2.00', '3.50', '200'],
+        ['Sample health Item', 'health', 'health item description', '2.00', '3.50', '200'],
+        ['Sample jewelry Item', 'jewelry', 'jewelry item description', '2.00', '3.50', '200'],
+        ['Sample music Item', 'music', 'music item description', '2.00', '3.50', '200'],
+        ['Sample pets Item', 'pets', 'pets item description', '2.00', '3.50', '200'],
+        ['Sample office Item', 'office', 'office item description', '2.00', '3.50', '200'],
+        ['Sample tools Item', 'tools', 'tools item description', '2.00', '3.50', '200'],
+        ['Sample other Item', 'other', 'other item description', '2.00', '3.50', '200']
+    ]
     
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = 'attachment; filename=products_template.csv'
+    def generate():
+        # Reuse one small buffer; each row is sent as soon as it is written
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
     
-    return response
+    return Response(generate(), mimetype='text/csv', headers={
+        'Content-Disposition': 'attachment; filename=products_template.csv'
+    })
 
 # Keep other existing routes unchanged
 @bp.route('/<int:product_id>/delete', methods=['POST'])
 @login_required
 @admin_required
 def delete_product(product_id):
-    product = Product.query.get_or_404(product_id)
-    
-    if product.sale_items:
+    # Load the product and probe its sales history in the same query
+    row = db.session.query(
+        Product, SaleItem.query.filter_by(product_id=product_id).exists().label('has_sales')
+    ).filter(Product.id == product_id).first()
+    if row is None:
+        abort(404)
+    product, has_sales = row
+    if has_sales:
         flash('Cannot delete product with existing sales history.', 'danger')
         return redirect(url_for('products.list_products'))
     
     product_name = product.name
     product_sku = product.sku
-    db.session.delete(product)
+    # A DELETE statement skips loading the (known empty) sale_items collection
+    db.session.execute(db.delete(Product).where(Product.id == product_id))
     db.session.commit()
+    invalidate_sales_reports()
     flash(f'Product "{product_name}" (SKU: {product_sku}) deleted successfully!', 'info')
     return redirect(url_for('products.list_products'))
 
+def _product_page_json(query, quantity_key):
+    """
+    One page of products as JSON, with the total match count
+    
+    Rows are fetched as plain column tuples, one page at a time, so large
+    catalogues are never loaded in full. Pass page and per_page in the query
+    string to walk the results.
+    
+    The ETag covers the full URL and the catalogue version (row count plus
+    latest updated_at), so repeat polls answer 304 after one cheap query.
+    """
+    version = db.session.query(func.count(Product.id), func.max(Product.updated_at)).one()
+    etag = hashlib.md5(repr((request.full_path, tuple(version))).encode()).hexdigest()
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    
+    pagination = query.with_entities(
+        Product.id, Product.sku, Product.name, Product.category,
+        Product.full_price, Product.quantity
+    ).order_by(Product.name, Product.id).paginate(
+        page=page, per_page=per_page, max_per_page=200, error_out=False
+    )
+    
+    items = [
+        {
+            "id": p.id,
+            "sku": p.sku,
+            "name": p.name,
+            "category": Product.CATEGORIES_MAP.get(p.category, p.category.title()),
+            "price": float(p.full_price),
+            quantity_key: float(p.quantity),
+            "status": (
+                "Out of Stock" if p.quantity == 0 
+                else "Low Stock" if p.quantity <= 5 
+                else "In Stock"
+            )
+        }
+        for p in pagination.items
+    ]
+    return validated(jsonify({
+        'items': items,
+        'total': pagination.total,
+        'page': pagination.page,
+        'pages': pagination.pages
+    }), etag)
+
 @bp.route('/search')
 @login_required
 def search_products():
@@ -417,7 +500,7 @@ def search_products():
     category = request.args.get('category', '')
     
     if not q and not category:
-        return jsonify([])
+        return jsonify({'items': [], 'total': 0, 'page': 1, 'pages': 0})
 
     query = Product.query
     
@@ -431,25 +514,7 @@ def search_products():
     if category and category != 'all':
         query = query.filter(Product.category == category)
 
-    products = query.all()
-
-    results = [
-        {
-            "id": p.id,
-            "sku": p.sku,
-            "name": p.name,
-            "category": p.category_display,
-            "price": float(p.full_price),
-            "stock": float(p.quantity),
-            "status": (
-                "Out of Stock" if p.quantity == 0 
-                else "Low Stock" if p.quantity <= 5 
-                else "In Stock"
-            )
-        }
-        for p in products
-    ]
-    return jsonify(results)
+    return _product_page_json(query, 'stock')
 
 @bp.route('/all')
 @login_required
@@ -460,202 +525,140 @@ def all_products():
     if category and category != 'all':
         query = query.filter(Product.category == category)
     
-    products = query.all()
-    results = [
-        {
-            "id": p.id,
-            "sku": p.sku,
-            "name": p.name,
-            "category": p.category_display,
-            "price": float(p.full_price),
-            "quantity": float(p.quantity),
-            "status": (
-                "Out of Stock" if p.quantity == 0
-                else "Low Stock" if p.quantity <= 5
-                else "In Stock"
-            )
-        }
-        for p in products
-    ]
-    return jsonify(results)
+    return _product_page_json(query, 'quantity')
 
 @bp.route('/bulk-update', methods=['POST'])
 @login_required
 @admin_required
 def bulk_update_products():
     """Handle bulk update of products"""
-    print("=== BULK UPDATE DEBUG START ===")
-    
     try:
         # Check if request has JSON content
         if not request.is_json:
-            print(f"ERROR: Request is not JSON. Content-Type: {request.content_type}")
             return jsonify({'success': False, 'message': 'Request must be JSON'}), 400
         
         data = request.get_json()
-        print(f"Received data: {data}")
+        current_app.logger.debug('Bulk update request: %s', data)
         
         if not data:
-            print("ERROR: No data provided")
             return jsonify({'success': False, 'message': 'No data provided'}), 400
         
         product_ids = data.get('product_ids', [])
-        print(f"Product IDs: {product_ids}")
         
         if not product_ids:
-            print("ERROR: No products selected")
             return jsonify({'success': False, 'message': 'No products selected'}), 400
         
         # Convert string IDs to integers
         try:
             product_ids = [int(pid) for pid in product_ids]
-            print(f"Converted product IDs: {product_ids}")
         except (ValueError, TypeError) as e:
-            print(f"ERROR: Invalid product ID format: {e}")
             return jsonify({'success': False, 'message': f'Invalid product ID format: {str(e)}'}), 400
         
-        # Get the products to update
-        products = Product.query.filter(Product.id.in_(product_ids)).all()
-        print(f"Found {len(products)} products to update")
+        def supplied(field):
+            return data.get(field) is not None and str(data[field]).strip() != ''
+        
+        # The new values are the same for every product, so parse them once
+        parsed = {}
+        for field, label, convert in (
+            ('purchase_price', 'purchase price', lambda value: Decimal(str(value))),
+            ('full_price', 'full price', lambda value: Decimal(str(value))),
+            ('half_price', 'half price', lambda value: Decimal(str(value))),
+            ('quantity', 'quantity', int)
+        ):
+            if supplied(field):
+                try:
+                    parsed[field] = convert(data[field])
+                except (ValueError, TypeError, InvalidOperation) as e:
+                    error_msg = f'Invalid {label} format: {str(e)}'
+                    current_app.logger.warning('Bulk update rejected: %s', error_msg)
+                    return jsonify({'success': False, 'message': error_msg}), 400
+        
+        values = {}
+        if parsed.get('purchase_price', -1) >= 0:
+            values['purchase_price'] = parsed['purchase_price']
+        if parsed.get('full_price', 0) > 0:
+            values['full_price'] = parsed['full_price']
+            values['price'] = parsed['full_price']  # For backward compatibility
+        if 'half_price' in parsed:
+            if parsed['half_price'] > 0:
+                values['half_price'] = parsed['half_price']
+        elif 'full_price' in parsed:
+            # Auto-calculate half price if full price was updated but half price not provided
+            values['half_price'] = values.get('full_price', Product.full_price) / Decimal('2')
+        if parsed.get('quantity', -1) >= 0:
+            values['quantity'] = parsed['quantity']
+        
+        new_category = str(data['category']).strip() if supplied('category') else None
+        if new_category is not None:
+            if new_category not in Product.CATEGORIES_MAP:
+                error_msg = f'Invalid category "{new_category}". Valid options: {", ".join(Product.CATEGORIES_MAP)}'
+                current_app.logger.warning('Bulk update rejected: %s', error_msg)
+                return jsonify({'success': False, 'message': error_msg}), 400
+            values['category'] = new_category
+        
+        # Only ids and categories are needed; the update itself runs in SQL
+        products = db.session.query(Product.id, Product.category).filter(Product.id.in_(product_ids)).all()
+        current_app.logger.debug('Bulk update found %d of %d products', len(products), len(product_ids))
         
         if not products:
-            print("ERROR: No valid products found")
             return jsonify({'success': False, 'message': 'No valid products found'}), 404
         
-        updated_count = 0
-        
-        for product in products:
-            print(f"Updating product: {product.sku} - {product.name}")
-            
-            try:
-                # Update purchase price
-                if data.get('purchase_price') is not None and str(data['purchase_price']).strip() != '':
-                    try:
-                        new_purchase_price = Decimal(str(data['purchase_price']))
-                        print(f"  Setting purchase price: {new_purchase_price}")
-                        if new_purchase_price >= 0:
-                            product.purchase_price = new_purchase_price
-                    except (ValueError, TypeError) as e:
-                        error_msg = f'Invalid purchase price format for product {product.sku}: {str(e)}'
-                        print(f"ERROR: {error_msg}")
-                        return jsonify({'success': False, 'message': error_msg}), 400
-                
-                # Update full price
-                if data.get('full_price') is not None and str(data['full_price']).strip() != '':
-                    try:
-                        new_full_price = Decimal(str(data['full_price']))
-                        print(f"  Setting full price: {new_full_price}")
-                        if new_full_price > 0:
-                            product.full_price = new_full_price
-                            product.price = new_full_price  # For backward compatibility
-                    except (ValueError, TypeError) as e:
-                        error_msg = f'Invalid full price format for product {product.sku}: {str(e)}'
-                        print(f"ERROR: {error_msg}")
-                        return jsonify({'success': False, 'message': error_msg}), 400
-                
-                # Update half price or auto-calculate
-                if data.get('half_price') is not None and str(data['half_price']).strip() != '':
-                    try:
-                        new_half_price = Decimal(str(data['half_price']))
-                        print(f"  Setting half price: {new_half_price}")
-                        if new_half_price > 0:
-                            product.half_price = new_half_price
-                    except (ValueError, TypeError) as e:
-                        error_msg = f'Invalid half price format for product {product.sku}: {str(e)}'
-                        print(f"ERROR: {error_msg}")
-                        return jsonify({'success': False, 'message': error_msg}), 400
-                elif data.get('full_price') is not None and str(data['full_price']).strip() != '':
-                    # Auto-calculate half price if full price was updated but half price not provided
-                    auto_half_price = product.full_price / Decimal('2')
-                    print(f"  Auto-calculating half price: {auto_half_price}")
-                    product.half_price = auto_half_price
-                
-                # Update quantity
-                if data.get('quantity') is not None and str(data['quantity']).strip() != '':
-                    try:
-                        new_quantity = int(data['quantity'])
-                        print(f"  Setting quantity: {new_quantity}")
-                        if new_quantity >= 0:
-                            product.quantity = new_quantity
-                    except (ValueError, TypeError) as e:
-                        error_msg = f'Invalid quantity format for product {product.sku}: {str(e)}'
-                        print(f"ERROR: {error_msg}")
-                        return jsonify({'success': False, 'message': error_msg}), 400
-                
-                # Update category
-                if data.get('category') is not None and str(data['category']).strip() != '':
-                    new_category = str(data['category']).strip()
-                    print(f"  Setting category: {new_category}")
-                    
-                    # Validate category
-                    valid_categories = [cat[0] for cat in Product.CATEGORIES]
-                    print(f"  Valid categories: {valid_categories}")
-                    
-                    if new_category in valid_categories:
-                        old_category = product.category
-                        product.category = new_category
-                        
-                        # If category changed, generate new SKU
-                        if old_category != new_category:
-                            try:
-                                print(f"  Category changed from {old_category} to {new_category}, generating new SKU")
-                                new_sku = Product.generate_sku(new_category)
-                                
-                                # Ensure uniqueness
-                                counter = 1
-                                original_sku = new_sku
-                                while Product.query.filter_by(sku=new_sku).filter(Product.id != product.id).first():
-                                    base = original_sku[:3]
-                                    base_number = int(original_sku[3:])
-                                    new_sku = f"{base}{(base_number + counter):04d}"
-                                    counter += 1
-                                
-                                print(f"  Generated new SKU: {new_sku}")
-                                product.sku = new_sku
-                            except Exception as sku_error:
-                                error_msg = f'Error generating SKU for product {product.sku}: {str(sku_error)}'
-                                print(f"ERROR: {error_msg}")
-                                return jsonify({'success': False, 'message': error_msg}), 400
-                    else:
-                        error_msg = f'Invalid category "{new_category}" for product {product.sku}. Valid options: {", ".join(valid_categories)}'
-                        print(f"ERROR: {error_msg}")
-                        return jsonify({'success': False, 'message': error_msg}), 400
-                
-                # Validate prices after all updates
-                print(f"  Validating prices - Purchase: {product.purchase_price}, Full: {product.full_price}, Half: {product.half_price}")
-                
-                if product.purchase_price >= product.full_price:
-                    error_msg = f'Purchase price (GHS {product.purchase_price}) must be less than full price (GHS {product.full_price}) for product {product.sku}'
-                    print(f"ERROR: {error_msg}")
-                    return jsonify({'success': False, 'message': error_msg}), 400
-                
-                if product.half_price and product.half_price >= product.full_price:
-                    error_msg = f'Half price (GHS {product.half_price}) must be less than full price (GHS {product.full_price}) for product {product.sku}'
-                    print(f"ERROR: {error_msg}")
-                    return jsonify({'success': False, 'message': error_msg}), 400
-                
-                updated_count += 1
-                print(f"  Successfully updated product {product.sku}")
-                
-            except Exception as product_error:
-                error_msg = f'Error updating product {product.sku}: {str(product_error)}'
-                print(f"ERROR: {error_msg}")
-                return jsonify({'success': False, 'message': error_msg}), 400
+        # Check the prices each product would end up with in one query
+        def resulting(name):
+            value = values.get(name, getattr(Product, name))
+            if isinstance(value, Decimal):
+                value = literal(value, Product.__table__.c[name].type)
+            return value
+        
+        purchase, full, half = (resulting(name) for name in ('purchase_price', 'full_price', 'half_price'))
+        invalid = db.session.query(
+            Product.sku, purchase.label('purchase'), full.label('full'), half.label('half')
+        ).filter(
+            Product.id.in_(product_ids),
+            or_(purchase >= full, and_(half != 0, half >= full))
+        ).first()
+        if invalid is not None:
+            if invalid.purchase >= invalid.full:
+                error_msg = f'Purchase price (GHS {invalid.purchase}) must be less than full price (GHS {invalid.full}) for product {invalid.sku}'
+            else:
+                error_msg = f'Half price (GHS {invalid.half}) must be less than full price (GHS {invalid.full}) for product {invalid.sku}'
+            current_app.logger.warning('Bulk update rejected: %s', error_msg)
+            return jsonify({'success': False, 'message': error_msg}), 400
+        
+        # Products moving to another category get a fresh SKU each, drawn
+        # from one block reserved with a single sequence update
+        if new_category is not None:
+            moved = [product.id for product in products if product.category != new_category]
+            if moved:
+                prefix = new_category.upper()[:3]
+                first = SkuSequence.next_value(prefix, len(moved)) - len(moved) + 1
+                sku_rows = [
+                    {'id': product_id, 'sku': f'{prefix}{number:04d}'}
+                    for number, product_id in enumerate(moved, first)
+                ]
+                db.session.execute(db.update(Product), sku_rows)
+                current_app.logger.debug('Bulk update moved %d products to %s', len(sku_rows), new_category)
+        
+        # Every other change is shared, so one UPDATE covers the whole selection
+        if values:
+            db.session.execute(
+                db.update(Product).where(Product.id.in_(product_ids)).values(**values),
+                execution_options={'synchronize_session': 'fetch'}
+            )
+        updated_count = len(products)
         
         # Commit all changes
         try:
-            print(f"Committing changes for {updated_count} products")
             db.session.commit()
-            print("Database commit successful")
+            invalidate_sales_reports()
         except Exception as commit_error:
             db.session.rollback()
             error_msg = f'Database error while saving changes: {str(commit_error)}'
-            print(f"ERROR: {error_msg}")
+            current_app.logger.error('Bulk product update commit failed: %s', commit_error)
             return jsonify({'success': False, 'message': error_msg}), 500
         
         success_msg = f'Successfully updated {updated_count} products'
-        print(f"SUCCESS: {success_msg}")
-        print("=== BULK UPDATE DEBUG END ===")
+        current_app.logger.debug('Bulk update committed %d products', updated_count)
         
         return jsonify({
             'success': True, 
@@ -666,8 +669,7 @@ def bulk_update_products():
     except Exception as e:
         db.session.rollback()
         error_msg = f'Unexpected error: {str(e)}'
-        print(f"FATAL ERROR: {error_msg}")
-        print("=== BULK UPDATE DEBUG END (WITH ERROR) ===")
+        current_app.logger.exception('Bulk product update failed')
         return jsonify({'success': False, 'message': error_msg}), 500
     
     # Add this route to your products.py file
@@ -698,12 +700,15 @@ def bulk_delete_products():
             flash('No valid products found for deletion.', 'error')
             return redirect(url_for('products.list_products'))
         
-        # Check if any products have sales history
+        # Check if any products have sales history, in one query for the batch
+        sold_ids = set(db.session.scalars(
+            db.select(SaleItem.product_id).where(SaleItem.product_id.in_(product_ids)).distinct()
+        ))
         products_with_sales = []
         products_to_delete = []
         
         for product in products:
-            if product.sale_items:
+            if product.id in sold_ids:
                 products_with_sales.append(product)
             else:
                 products_to_delete.append(product)
@@ -728,10 +733,14 @@ def bulk_delete_products():
         
         for product in products_to_delete:
             deleted_names.append(f"{product.name} ({product.sku})")
-            db.session.delete(product)
             deleted_count += 1
         
+        # One DELETE for the batch; none of these products has sale items to load
+        db.session.execute(db.delete(Product).where(
+            Product.id.in_([product.id for product in products_to_delete])
+        ))
         db.session.commit()
+        invalidate_sales_reports()
         
         if deleted_count > 0:
             if deleted_count <= 3:
@@ -3,8 +3,10 @@ from flask_login import login_required
 from app.models import Sale, SaleItem, Product, User
 from app.decorators import manager_required, admin_required
 from app import db
+from app.pos import invalidate_sales_reports
 from datetime import datetime, timedelta
 from sqlalchemy import func, desc
+from sqlalchemy.orm import selectinload, joinedload, contains_eager
 import csv
 from io import StringIO
 
@@ -26,27 +28,31 @@ def sales_reports():
     if not end_date:
         end_date = datetime.now().strftime('%Y-%m-%d')
     
+    # Parse the range once; the end bound is exclusive so the whole end day counts
+    range_start = datetime.strptime(start_date, '%Y-%m-%d')
+    range_end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    
     # Build query
     query = Sale.query.filter(Sale.status == 'completed')  # Only completed sales
     
     # Date filter
-    if start_date:
-        query = query.filter(Sale.created_at >= datetime.strptime(start_date, '%Y-%m-%d'))
-    if end_date:
-        end_date_obj = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-        query = query.filter(Sale.created_at < end_date_obj)
+    query = query.filter(Sale.created_at >= range_start, Sale.created_at < range_end)
     
     # Clerk filter
     if clerk_id:
         query = query.filter(Sale.clerk_id == int(clerk_id))
     
     # Get sales data
-    sales = query.order_by(desc(Sale.created_at)).limit(50).all()
+    sales = query.options(
+        selectinload(Sale.sale_items), joinedload(Sale.clerk)
+    ).order_by(desc(Sale.created_at)).limit(50).all()
     
     # Calculate summary statistics - INCLUDING total_profit
-    total_sales = query.count()
-    total_revenue = query.with_entities(func.sum(Sale.total_amount)).scalar() or 0
-    total_profit = query.with_entities(func.sum(Sale.total_profit)).scalar() or 0
+    total_sales, total_revenue, total_profit = query.with_entities(
+        func.count(Sale.id),
+        func.coalesce(func.sum(Sale.total_amount), 0),
+        func.coalesce(func.sum(Sale.total_profit), 0)
+    ).one()
     average_sale = float(total_revenue) / total_sales if total_sales > 0 else 0
     
     # Get top products - Convert Row objects to dictionaries
@@ -58,8 +64,8 @@ def sales_reports():
         func.sum(SaleItem.quantity * SaleItem.price_at_sale).label('total_revenue'),
         func.sum((SaleItem.price_at_sale - SaleItem.cost_at_sale) * SaleItem.quantity).label('total_profit')
     ).join(SaleItem).join(Sale).filter(
-        Sale.created_at >= datetime.strptime(start_date, '%Y-%m-%d'),
-        Sale.created_at < (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)),
+        Sale.created_at >= range_start,
+        Sale.created_at < range_end,
         Sale.status == 'completed'
     ).group_by(Product.id, Product.name, Product.sku).order_by(desc('total_revenue')).limit(20).all()
     
@@ -83,8 +89,8 @@ def sales_reports():
         func.sum(Sale.total_amount).label('total_revenue'),
         func.sum(Sale.total_profit).label('total_profit')
     ).join(Sale).filter(
-        Sale.created_at >= datetime.strptime(start_date, '%Y-%m-%d'),
-        Sale.created_at < (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)),
+        Sale.created_at >= range_start,
+        Sale.created_at < range_end,
         Sale.status == 'completed'
     ).group_by(User.id, User.username).order_by(desc('total_revenue')).all()
     
@@ -102,29 +108,21 @@ def sales_reports():
     
     # Get daily sales data for chart - Convert Row objects to dictionaries
     daily_sales_query = db.session.query(
-        func.date(Sale.created_at).label('sale_date'),
+        func.date(Sale.created_at, type_=db.Date).label('sale_date'),
         func.count(Sale.id).label('total_sales'),
         func.sum(Sale.total_amount).label('total_revenue'),
         func.sum(Sale.total_profit).label('total_profit')
     ).filter(
-        Sale.created_at >= datetime.strptime(start_date, '%Y-%m-%d'),
-        Sale.created_at < (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)),
+        Sale.created_at >= range_start,
+        Sale.created_at < range_end,
         Sale.status == 'completed'
     ).group_by(func.date(Sale.created_at)).order_by('sale_date').all()
     
     # Convert to dictionaries
     daily_sales = []
     for row in daily_sales_query:
-        # Handle different date formats
-        if hasattr(row.sale_date, 'strftime'):
-            date_str = row.sale_date.strftime('%Y-%m-%d')
-        elif isinstance(row.sale_date, str):
-            date_str = row.sale_date
-        else:
-            date_str = str(row.sale_date)
-        
         daily_sales.append({
-            'sale_date': date_str,
+            'sale_date': row.sale_date.isoformat(),
             'total_sales': int(row.total_sales),
             'total_revenue': float(row.total_revenue),
             'total_profit': float(row.total_profit or 0)
@@ -137,8 +135,8 @@ def sales_reports():
         func.sum(SaleItem.price_at_sale * SaleItem.quantity).label('total_revenue'),
         func.sum((SaleItem.price_at_sale - SaleItem.cost_at_sale) * SaleItem.quantity).label('total_profit')
     ).join(Sale).filter(
-        Sale.created_at >= datetime.strptime(start_date, '%Y-%m-%d'),
-        Sale.created_at < (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)),
+        Sale.created_at >= range_start,
+        Sale.created_at < range_end,
         Sale.status == 'completed'
     ).group_by(SaleItem.unit_type).all()
     
@@ -148,8 +146,8 @@ def sales_reports():
         func.count(Sale.id).label('count'),
         func.sum(Sale.total_amount).label('total_amount')
     ).filter(
-        Sale.created_at >= datetime.strptime(start_date, '%Y-%m-%d'),
-        Sale.created_at < (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)),
+        Sale.created_at >= range_start,
+        Sale.created_at < range_end,
         Sale.status == 'completed'
     ).group_by(Sale.payment_method).all()
     
@@ -183,7 +181,8 @@ def export_sales():
     export_format = request.args.get('format', 'csv')
     
     # Build query
-    query = Sale.query.join(User)
+    # Only item counts are exported; the clerk comes from the join
+    query = Sale.query.join(User).options(selectinload(Sale.sale_items), contains_eager(Sale.clerk))
     
     if start_date:
         query = query.filter(Sale.created_at >= datetime.strptime(start_date, '%Y-%m-%d'))
@@ -272,16 +271,22 @@ def export_sales():
 @login_required
 @manager_required
 def detailed_sale(sale_id):
-    sale = Sale.query.get_or_404(sale_id)
+    sale = Sale.query.options(
+        selectinload(Sale.sale_items).joinedload(SaleItem.product),
+        joinedload(Sale.clerk)
+    ).get_or_404(sale_id)
     return render_template('reports/detailed_sale.html', sale=sale)
 
 @bp.route('/delete/<int:sale_id>', methods=['POST'])
 @login_required
 @admin_required
 def delete_sale(sale_id):
-    sale = Sale.query.get_or_404(sale_id)
+    sale = db.get_or_404(Sale, sale_id)
     
     try:
+        if sale.status == 'completed':
+            sale.apply_to_rollups(-1)
+        
         # Delete associated sale items first (due to foreign key constraints)
         SaleItem.query.filter_by(sale_id=sale_id).delete()
         
@@ -291,6 +296,7 @@ def delete_sale(sale_id):
         # Delete the sale
         db.session.delete(sale)
         db.session.commit()
+        invalidate_sales_reports()
         
         flash(f'Successfully deleted {sale_info}', 'success')
         
@@ -304,7 +310,7 @@ def delete_sale(sale_id):
 @login_required
 @admin_required
 def confirm_delete_sale(sale_id):
-    sale = Sale.query.get_or_404(sale_id)
+    sale = db.get_or_404(Sale, sale_id)
     return render_template('reports/confirm_delete.html', sale=sale)
 
 @bp.route('/bulk-delete', methods=['POST'])
@@ -323,15 +329,18 @@ def bulk_delete_sales():
     try:
         deleted_count = 0
         for sale_id in sale_ids:
+            sale = db.session.get(Sale, sale_id)
+            if sale and sale.status == 'completed':
+                sale.apply_to_rollups(-1)
             # Delete associated sale items first
             SaleItem.query.filter_by(sale_id=sale_id).delete()
             # Delete the sale
-            sale = Sale.query.get(sale_id)
             if sale:
                 db.session.delete(sale)
                 deleted_count += 1
         
         db.session.commit()
+        invalidate_sales_reports()
         flash(f'Successfully deleted {deleted_count} sales', 'success')
         return jsonify({'success': True, 'deleted_count': deleted_count})
         
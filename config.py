@@ -5,10 +5,35 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///pos.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # Room for every distinct statement the app issues, so hot-path
+        # queries (SKU / invoice generators) never get recompiled
+        'query_cache_size': 1200,
+        # Drop connections the server (or a proxy) may have closed while idle
+        'pool_pre_ping': True,
+        'pool_recycle': 1800
+    }
+    if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        # One connection per worker thread plus headroom for bursts
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20))
+        )
+    
+    # Caching (Flask-Caching); use e.g. RedisCache when running several workers
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'SimpleCache'
+    CACHE_DEFAULT_TIMEOUT = 300
     
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(hours=8)
     
+    # Password hashing (werkzeug method string); lower the scrypt N on small hosts
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    
+    # Number of reverse proxies in front of the app (Render uses one); their
+    # X-Forwarded-For header then supplies the real client address
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    
     # WTF settings
     WTF_CSRF_ENABLED = True
     WTF_CSRF_TIME_LIMIT = None
@@ -20,8 +45,16 @@ class ProductionConfig(Config):
     DEBUG = False
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'production-secret-please-change'
 
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    CACHE_TYPE = 'NullCache'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    WTF_CSRF_ENABLED = False
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
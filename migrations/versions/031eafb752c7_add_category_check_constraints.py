@@ -0,0 +1,37 @@
+"""Add category check constraints
+
+Revision ID: 031eafb752c7
+Revises: 5fa46779d414
+Create Date: 2026-10-16 09:35:32.548268
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '031eafb752c7'
+down_revision = '5fa46779d414'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_check_constraint(
+            'ck_product_category',
+            "category IN ('electronics', 'clothing', 'food', 'beauty', 'books', 'home', 'sports', 'automotive', 'toys', 'health', 'jewelry', 'music', 'pets', 'office', 'tools', 'other')"
+        )
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.create_check_constraint(
+            'ck_expense_category',
+            "category IN ('rent', 'utilities', 'supplies', 'inventory', 'maintenance', 'marketing', 'transportation', 'insurance', 'professional', 'other')"
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_expense_category', type_='check')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_product_category', type_='check')
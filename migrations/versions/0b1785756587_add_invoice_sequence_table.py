@@ -0,0 +1,28 @@
+"""Add invoice sequence table
+
+Revision ID: 0b1785756587
+Revises: d7b340999ca7
+Create Date: 2026-10-16 09:14:27.203477
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b1785756587'
+down_revision = 'd7b340999ca7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('invoice_sequence',
+    sa.Column('year', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('last_seq', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('year')
+    )
+
+
+def downgrade():
+    op.drop_table('invoice_sequence')
@@ -0,0 +1,39 @@
+"""Add sales daily rollup
+
+Revision ID: 0cd66e95a449
+Revises: 3858a10e8dc7
+Create Date: 2026-10-16 10:24:07.434787
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0cd66e95a449'
+down_revision = '3858a10e8dc7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('profit', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('sales_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+    # Backfill from the completed sales already recorded
+    op.execute(
+        "INSERT INTO sales_daily (day, revenue, profit, sales_count) "
+        "SELECT date(created_at), SUM(total_amount), SUM(total_profit), COUNT(id) "
+        "FROM sale "
+        "WHERE status = 'completed' "
+        "GROUP BY date(created_at)"
+    )
+
+
+def downgrade():
+    op.drop_table('sales_daily')
@@ -0,0 +1,25 @@
+"""Add sale status and created_at index
+
+Revision ID: 1e30f0805a3c
+Revises: ed7894ce29f7
+Create Date: 2026-10-16 09:56:53.055763
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1e30f0805a3c'
+down_revision = 'ed7894ce29f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.create_index('ix_sale_status_created_at', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_index('ix_sale_status_created_at')
@@ -0,0 +1,33 @@
+"""Add sale item sale_id and completed sales indexes
+
+Revision ID: 260e008f6ea2
+Revises: 1e30f0805a3c
+Create Date: 2026-10-16 10:03:14.667545
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '260e008f6ea2'
+down_revision = '1e30f0805a3c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sale_item', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sale_item_sale_id'), ['sale_id'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index('ix_sale_completed_created_at', 'sale', ['created_at'], unique=False,
+                        postgresql_where=sa.text("status = 'completed'"))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_sale_completed_created_at', table_name='sale')
+
+    with op.batch_alter_table('sale_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sale_item_sale_id'))
@@ -0,0 +1,31 @@
+"""Add sale clerk and expense date indexes
+
+Revision ID: 354bd8fba6f7
+Revises: 260e008f6ea2
+Create Date: 2026-10-16 10:10:26.639573
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '354bd8fba6f7'
+down_revision = '260e008f6ea2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.create_index('ix_sale_clerk_id_created_at', ['clerk_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_date', ['date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_date')
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.drop_index('ix_sale_clerk_id_created_at')
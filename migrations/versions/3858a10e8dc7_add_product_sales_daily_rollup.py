@@ -0,0 +1,44 @@
+"""Add product sales daily rollup
+
+Revision ID: 3858a10e8dc7
+Revises: 354bd8fba6f7
+Create Date: 2026-10-16 10:17:26.161526
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3858a10e8dc7'
+down_revision = '354bd8fba6f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('quantity_sold', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('profit', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+
+    # Backfill from the completed sales already recorded
+    op.execute(
+        "INSERT INTO product_sales_daily (day, product_id, quantity_sold, revenue, profit) "
+        "SELECT date(sale.created_at), sale_item.product_id, "
+        "SUM(sale_item.quantity), "
+        "SUM(sale_item.price_at_sale * sale_item.quantity), "
+        "SUM((sale_item.price_at_sale - sale_item.cost_at_sale) * sale_item.quantity) "
+        "FROM sale_item JOIN sale ON sale.id = sale_item.sale_id "
+        "WHERE sale.status = 'completed' "
+        "GROUP BY date(sale.created_at), sale_item.product_id"
+    )
+
+
+def downgrade():
+    op.drop_table('product_sales_daily')
@@ -0,0 +1,32 @@
+"""Add units_per_pack_at_sale to sale_item
+
+Revision ID: 5fa46779d414
+Revises: a68f0e8eb801
+Create Date: 2026-10-16 09:28:11.499626
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5fa46779d414'
+down_revision = 'a68f0e8eb801'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sale_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('units_per_pack_at_sale', sa.Integer(), nullable=False, server_default='1'))
+
+    # Backfill existing rows from the product's current pack size
+    op.execute(
+        'UPDATE sale_item SET units_per_pack_at_sale = '
+        '(SELECT product.units_per_pack FROM product WHERE product.id = sale_item.product_id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('sale_item', schema=None) as batch_op:
+        batch_op.drop_column('units_per_pack_at_sale')
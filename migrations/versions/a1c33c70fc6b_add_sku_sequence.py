@@ -0,0 +1,29 @@
+"""Add sku sequence table
+
+Revision ID: a1c33c70fc6b
+Revises: c27281bbe627
+Create Date: 2026-10-16 10:38:38.498977
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c33c70fc6b'
+down_revision = 'c27281bbe627'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows are seeded lazily from the existing SKUs on first use per prefix
+    op.create_table('sku_sequence',
+    sa.Column('prefix', sa.String(length=3), nullable=False),
+    sa.Column('last_seq', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('prefix')
+    )
+
+
+def downgrade():
+    op.drop_table('sku_sequence')
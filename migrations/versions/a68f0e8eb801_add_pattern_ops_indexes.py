@@ -0,0 +1,35 @@
+"""Add pattern ops indexes for sku and invoice prefixes
+
+Revision ID: a68f0e8eb801
+Revises: 0b1785756587
+Create Date: 2026-10-16 09:21:54.904688
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a68f0e8eb801'
+down_revision = '0b1785756587'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # varchar_pattern_ops is PostgreSQL-only; other backends keep the
+    # existing unique indexes on sku and invoice_number
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.create_index('ix_product_sku_pattern', 'product', ['sku'], unique=False,
+                    postgresql_ops={'sku': 'varchar_pattern_ops'})
+    op.create_index('ix_sale_invoice_number_pattern', 'sale', ['invoice_number'], unique=False,
+                    postgresql_ops={'invoice_number': 'varchar_pattern_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_sale_invoice_number_pattern', table_name='sale')
+    op.drop_index('ix_product_sku_pattern', table_name='product')
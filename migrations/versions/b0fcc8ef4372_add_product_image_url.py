@@ -0,0 +1,31 @@
+"""Add image_url to product
+
+Revision ID: b0fcc8ef4372
+Revises: 031eafb752c7
+Create Date: 2026-10-16 09:42:34.895676
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b0fcc8ef4372'
+down_revision = '031eafb752c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_url', sa.String(length=600), nullable=True))
+
+    op.execute(
+        "UPDATE product SET image_url = '/static/uploads/product_images/' || image_filename "
+        "WHERE image_filename IS NOT NULL AND image_path IS NOT NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('image_url')
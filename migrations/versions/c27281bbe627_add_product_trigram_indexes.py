@@ -0,0 +1,34 @@
+"""Add trigram indexes for product search
+
+Revision ID: c27281bbe627
+Revises: 0cd66e95a449
+Create Date: 2026-10-16 10:31:46.352260
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27281bbe627'
+down_revision = '0cd66e95a449'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm GIN indexes are PostgreSQL-only; other backends keep scanning
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in ('name', 'sku', 'description'):
+        op.create_index(f'ix_product_{column}_trgm', 'product', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for column in ('description', 'sku', 'name'):
+        op.drop_index(f'ix_product_{column}_trgm', table_name='product')
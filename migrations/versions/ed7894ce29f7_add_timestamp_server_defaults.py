@@ -0,0 +1,50 @@
+"""Add server defaults to timestamp columns
+
+Revision ID: ed7894ce29f7
+Revises: b0fcc8ef4372
+Create Date: 2026-10-16 09:49:44.070415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ed7894ce29f7'
+down_revision = 'b0fcc8ef4372'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'))
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'))
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'))
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=None)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=None)
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), server_default=None)
+
+    with op.batch_alter_table('sale', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=None)
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), server_default=None)
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=None)
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), server_default=None)
@@ -0,0 +1,95 @@
+"""Views that walk many related rows must not lazy-load them one by one.
+
+The testing app raises AssertionError on the second lazy load of the same
+relationship within a request, so these only pass when the views eager-load.
+"""
+import pytest
+
+from app import db
+from app.models import Product, Sale, SaleItem, User
+
+ITEM_COUNT = 50
+
+
+@pytest.fixture
+def seeded(app):
+    """ITEM_COUNT products and a completed sale with one line per product"""
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').one()
+        products = [
+            Product(
+                name=f'Product {i}',
+                sku=f'TEST{i:04d}',
+                category='food',
+                purchase_price=1,
+                full_price=2,
+                price=2,
+                quantity=100
+            )
+            for i in range(ITEM_COUNT)
+        ]
+        db.session.add_all(products)
+        db.session.flush()
+        
+        sale = Sale(
+            clerk_id=admin.id,
+            total_amount=2 * ITEM_COUNT,
+            total_profit=ITEM_COUNT,
+            status='completed',
+            payment_method='cash',
+            amount_paid=2 * ITEM_COUNT,
+            change_given=0
+        )
+        db.session.add(sale)
+        db.session.flush()
+        db.session.add_all(
+            SaleItem(
+                sale_id=sale.id,
+                product_id=product.id,
+                quantity=1,
+                unit_type='full',
+                price_at_sale=2,
+                cost_at_sale=1,
+                units_per_pack_at_sale=1
+            )
+            for product in products
+        )
+        db.session.flush()
+        sale.apply_to_rollups(1)
+        db.session.commit()
+        
+        return {'sale_id': sale.id, 'product_ids': [p.id for p in products]}
+
+
+def test_export_sales_excel(admin_client, seeded):
+    # Failures inside the export are turned into a redirect, so check the file
+    response = admin_client.get('/pos/export-sales-excel')
+    
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def test_checkout(admin_client, seeded):
+    response = admin_client.post('/pos/checkout', json={
+        'items': [
+            {'product_id': product_id, 'quantity': 1, 'unit_type': 'full'}
+            for product_id in seeded['product_ids']
+        ],
+        'payment_method': 'cash',
+        'amount_paid': 2 * ITEM_COUNT,
+        'change_given': 0
+    })
+    
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['success'] is True
+
+
+def test_update_sale_status(admin_client, seeded):
+    url = f"/pos/sales/{seeded['sale_id']}/status"
+    
+    assert admin_client.get(url).status_code == 200
+    
+    response = admin_client.post(url, data={'status': 'cancelled'})
+    
+    assert response.status_code == 302
+    assert response.location.endswith('/pos/list-sales')
@@ -0,0 +1,31 @@
+from app import db
+from app.models import Product
+
+
+def test_bulk_category_move_assigns_sequential_skus(app, admin_client):
+    with app.app_context():
+        products = [
+            Product(
+                name=f'Product {i}',
+                sku=f'FOO{i:04d}',
+                category='food',
+                purchase_price=1,
+                full_price=2,
+                price=2,
+                quantity=10
+            )
+            for i in range(5)
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        product_ids = [p.id for p in products]
+    
+    response = admin_client.post('/products/bulk-update', json={
+        'product_ids': product_ids,
+        'category': 'electronics'
+    })
+    
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        skus = [db.session.get(Product, product_id).sku for product_id in product_ids]
+    assert skus == [f'ELE{number:04d}' for number in range(1, 6)]